@@ -0,0 +1,46 @@
+import errno
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import fitz
+
+import unredact
+
+
+class OpenPdfWithRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def assert_fails_at_once(self, path, error):
+        with mock.patch.object(unredact.time, "sleep") as sleep:
+            with self.assertRaises(error):
+                unredact.open_pdf_with_retry(path)
+        sleep.assert_not_called()
+
+    def test_garbage_file_is_not_retried(self):
+        self.assert_fails_at_once(self.write("random.pdf", os.urandom(4096)), fitz.FileDataError)
+
+    def test_broken_pdf_is_not_retried(self):
+        path = self.write("broken.pdf", b"%PDF-1.4\n" + os.urandom(4096))
+        self.assert_fails_at_once(path, fitz.FileDataError)
+
+    def test_transient_error_is_retried(self):
+        doc = fitz.open()
+        flaky = OSError(errno.EIO, "Input/output error")
+        with mock.patch.object(unredact.fitz, "open", side_effect=[flaky, doc]), \
+             mock.patch.object(unredact.time, "sleep") as sleep:
+            self.assertIs(unredact.open_pdf_with_retry("share.pdf"), doc)
+        sleep.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
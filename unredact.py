@@ -10,18 +10,419 @@ Some code borrowed from Lee Drake https://github.com/leedrake5/unredact
 """
 
 import fitz  # PyMuPDF
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog, ttk
-import io
-import cv2
 import numpy as np
 import os
+import errno
 import glob
 import html
-import pdfplumber
+import json
+import re
+import threading
+import time
+import gc
+import hashlib
+import logging
+import multiprocessing
+import shelve
 from pathlib import Path
 from datetime import datetime
+from collections import OrderedDict, defaultdict, deque
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# MuPDF is not thread-safe: any PyMuPDF work that can overlap with the
+# background render thread has to hold this lock
+MUPDF_LOCK = threading.RLock()
+
+# Number of rendered pages kept around for quick page flips / zoom changes,
+# and a cap on the memory they take (Tk keeps 4 bytes per pixel)
+PAGE_CACHE_SIZE = 16
+PAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Zoom in/out steps through these levels, so the same few zooms come up again
+# and again and their renders can be cached and prefetched
+ZOOM_LEVELS = (0.25, 0.33, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0, 4.0, 5.0)
+
+# Zoom changes arriving within this many ms of each other share a single render
+ZOOM_DEBOUNCE_MS = 80
+
+# Run a full garbage collection after this many page changes
+GC_EVERY_PAGES = 20
+
+# Boxes detected in previously opened PDFs, keyed by file fingerprint and page
+BOX_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "unredactor", "boxes")
+
+# Pages bigger than this (in pixels at the current zoom) are only rendered
+# around the part that is scrolled into view
+FULL_RENDER_MAX_PIXELS = 4000000
+
+# Size (in PDF points) of the grid cells used to look up the box under the mouse
+BOX_GRID_CELL = 64
+
+# Scale scanned pages are rendered at to look for boxes; pages narrower than
+# DETECT_SMALL_PAGE_WIDTH points get the higher scale
+DETECT_SCALE = 1
+DETECT_SCALE_SMALL = 2
+DETECT_SMALL_PAGE_WIDTH = 400
+
+# Worker processes used to find boxes for Replace on All Pages and to extract
+# text for the exports; each only gets a worker per this many pages (fewer
+# pages are done in-process, not worth starting a pool for)
+REPLACE_WORKERS = int(os.environ.get("UNREDACT_WORKERS", 0)) or os.cpu_count() or 1
+REPLACE_PAGES_PER_WORKER = 8
+EXPORT_PAGES_PER_WORKER = 8
+
+# Text extraction flags: MuPDF's defaults, except that ligatures are split
+# into their letters, which is quicker and makes "ﬁ" searchable as "fi"
+TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES
+
+# Auto unredact keeps at most this many PDFs queued or in progress on its
+# worker processes at once
+AUTO_MAX_PENDING = 4 * (os.cpu_count() or 1)
+
+# Opening a PDF that fails to read is retried this many times in total, waiting
+# OPEN_RETRY_DELAY seconds the first time and twice as long each time after,
+# up to OPEN_RETRY_MAX_DELAY (for flaky network shares)
+OPEN_RETRIES = 3
+OPEN_RETRY_DELAY = 0.5
+OPEN_RETRY_MAX_DELAY = 4
+# Read errors worth waiting out; anything else (a missing, unreadable or
+# broken file) fails straight away
+OPEN_RETRY_ERRNOS = {errno.EIO, errno.EAGAIN, errno.ESTALE}
+
+# Record in the output folder of which PDFs auto unredact has already turned
+# into HTML, so re-runs can skip them
+UNREDACT_INDEX_NAME = ".unredact_index.json"
+
+# HTML scaffolding for auto unredact, filled in with str.format and written
+# out piece by piece
+
+# Buffer size for writing the generated HTML files
+HTML_WRITE_BUFFER = 1 << 20
+
+PAGE_HEAD_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Extracted Text: {pdf_name}</title>
+    <link rel="stylesheet" type="text/css" href="style.css">
+</head>
+<body>
+    <div class="header">
+        <h1>Extracted Text: {pdf_name}</h1>
+        <p>Original PDF: {pdf_path}</p>
+        <p>Generated on: {generated}</p>
+    </div>
+    
+    <div class="file-info">
+        <p><strong>Source:</strong> {pdf_path}</p>
+        <p><strong>Pages:</strong> {page_count}</p>
+        <p><strong>Extraction Method:</strong> {method}</p>
+    </div>
+    {nav}
+    <div class="sequence-info">
+        <p><strong>File Sequence:</strong> {pdf_name}</p>
+        <p><strong>Adjacent Files:</strong> {adjacent}</p>
+    </div>
+{warning}"""
+
+PAGE_FOOT_TEMPLATE = """{nav}
+</body>
+</html>"""
+
+NAV_TEMPLATE = """
+    <div class="navigation">
+        <div class="nav-buttons">
+            {prev}
+            <a href="index.html" class="nav-button home">Index</a>
+            {next}
+        </div>
+    </div>
+"""
+NAV_PREV_LINK = '<a href="{href}" class="nav-button prev">← Previous File</a>'
+NAV_PREV_NONE = '<span class="nav-button disabled">← No Previous</span>'
+NAV_NEXT_LINK = '<a href="{href}" class="nav-button next">Next File →</a>'
+NAV_NEXT_NONE = '<span class="nav-button disabled">No Next →</span>'
+
+# The parts of a written page that depend on its neighbours (see patch_navigation)
+NAV_RE = re.compile(r'<div class="navigation">.*?</div>\s*</div>', re.DOTALL)
+ADJACENT_RE = re.compile(r'(<p><strong>Adjacent Files:</strong> ).*?(</p>)', re.DOTALL)
+
+OCR_WARNING_HTML = """
+    <div class="warning">
+        <strong>⚠️ WARNING:</strong> This PDF has no text stream - using OCR (may have errors).
+        The PDF was converted to images, likely to hide the text layer.
+    </div>
+"""
+
+PAGE_SECTION_TEMPLATE = """
+    <div class="page">
+        <div class="page-header">Page {num}</div>
+        <div class="page-content">{text}</div>
+    </div>
+"""
+
+# Shared by the index and every page, written once as style.css
+STYLESHEET_CSS = """\
+    body {
+        font-family: Arial, sans-serif;
+        max-width: 1200px;
+        margin: 0 auto;
+        padding: 20px;
+        line-height: 1.6;
+        background-color: #f5f5f5;
+    }
+    .header {
+        background-color: #2c3e50;
+        color: white;
+        padding: 20px;
+        border-radius: 5px;
+        margin-bottom: 20px;
+    }
+    .stats {
+        background-color: #e8f4fc;
+        padding: 15px;
+        border-radius: 5px;
+        margin-bottom: 20px;
+        display: flex;
+        justify-content: space-between;
+        flex-wrap: wrap;
+    }
+    .stat-box {
+        background-color: white;
+        padding: 10px 20px;
+        border-radius: 5px;
+        margin: 5px;
+        box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+    }
+    .group {
+        background-color: white;
+        padding: 20px;
+        border-radius: 5px;
+        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+        margin-bottom: 30px;
+    }
+    .group-header {
+        background-color: #3498db;
+        color: white;
+        padding: 10px 15px;
+        margin: -20px -20px 20px -20px;
+        border-radius: 5px 5px 0 0;
+        font-weight: bold;
+        font-size: 18px;
+    }
+    .file-list {
+        display: grid;
+        grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
+        gap: 15px;
+    }
+    .file-item {
+        padding: 15px;
+        border: 1px solid #eee;
+        border-radius: 5px;
+        background-color: #f8f9fa;
+        transition: transform 0.2s, box-shadow 0.2s;
+    }
+    .file-item:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+        background-color: #e8f4fc;
+    }
+    .file-name {
+        font-weight: bold;
+        color: #2c3e50;
+        font-size: 16px;
+        margin-bottom: 5px;
+    }
+    .view-link {
+        display: inline-block;
+        background-color: #27ae60;
+        color: white;
+        padding: 8px 15px;
+        text-decoration: none;
+        border-radius: 3px;
+        font-size: 14px;
+        margin-top: 10px;
+    }
+    .view-link:hover {
+        background-color: #229954;
+    }
+    .timestamp {
+        color: #666;
+        font-size: 12px;
+    }
+    .sequence-nav {
+        display: flex;
+        justify-content: space-between;
+        margin-top: 15px;
+        font-size: 12px;
+        color: #666;
+    }
+    .nav-hint {
+        background-color: #f8f9fa;
+        padding: 10px;
+        border-radius: 5px;
+        margin-bottom: 20px;
+        border-left: 4px solid #27ae60;
+        font-size: 14px;
+    }
+    .file-info, .sequence-info {
+        background-color: white;
+        padding: 15px;
+        border-radius: 5px;
+        margin-bottom: 20px;
+        box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+    }
+    .nav-buttons {
+        display: flex;
+        justify-content: space-between;
+        margin: 20px 0;
+    }
+    .nav-button {
+        display: inline-block;
+        background-color: #3498db;
+        color: white;
+        padding: 8px 15px;
+        text-decoration: none;
+        border-radius: 3px;
+        font-size: 14px;
+    }
+    .nav-button:hover {
+        background-color: #2980b9;
+    }
+    .nav-button.home {
+        background-color: #27ae60;
+    }
+    .nav-button.home:hover {
+        background-color: #229954;
+    }
+    .nav-button.disabled {
+        background-color: #bdc3c7;
+        cursor: default;
+    }
+    .warning {
+        background-color: #fdecea;
+        padding: 10px 15px;
+        border-radius: 5px;
+        margin-bottom: 20px;
+        border-left: 4px solid #e74c3c;
+    }
+    .page {
+        background-color: white;
+        padding: 20px;
+        border-radius: 5px;
+        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+        margin-bottom: 30px;
+    }
+    .page-header {
+        background-color: #3498db;
+        color: white;
+        padding: 10px 15px;
+        margin: -20px -20px 20px -20px;
+        border-radius: 5px 5px 0 0;
+        font-weight: bold;
+    }
+    .page-content {
+        white-space: pre-wrap;
+        font-family: "Courier New", monospace;
+        font-size: 14px;
+    }
+"""
+
+INDEX_HEAD_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Extracted PDF Text - Index</title>
+    <link rel="stylesheet" type="text/css" href="style.css">
+</head>
+<body>
+    <div class="header">
+        <h1>Extracted PDF Text - Index</h1>
+        <p>Browse all extracted text from PDF files with sequential navigation</p>
+    </div>
+    
+    <div class="stats">
+        <div class="stat-box">
+            <strong>Total Files:</strong> {total}
+        </div>
+        <div class="stat-box">
+            <strong>Successfully Processed:</strong> {processed}
+        </div>
+        <div class="stat-box">
+            <strong>Failed:</strong> {failed}
+        </div>
+        <div class="stat-box">
+            <strong>File Groups:</strong> {groups}
+        </div>
+        <div class="stat-box">
+            <strong>Generated:</strong> {generated}
+        </div>
+    </div>
+    
+    <div class="nav-hint">
+        <strong>💡 Navigation Tip:</strong> In individual file views, use the Previous/Next buttons at the top and bottom to navigate through sequential files. Files are automatically linked by their numerical sequence (e.g., EFTA0000000001 → EFTA0000000002).
+    </div>
+"""
+
+# Each file item only carries its neighbours as data-prev/data-next, the
+# script builds their sequence links when the index is opened
+INDEX_FOOT = """
+<script>
+document.querySelectorAll(".file-item[data-prev], .file-item[data-next]").forEach(function (item) {
+    var nav = document.createElement("div");
+    nav.className = "sequence-nav";
+    if (item.dataset.prev) {
+        nav.appendChild(document.createElement("span")).textContent = "← " + item.dataset.prev;
+    }
+    if (item.dataset.next) {
+        nav.appendChild(document.createElement("span")).textContent = item.dataset.next + " →";
+    }
+    item.insertBefore(nav, item.querySelector(".view-link"));
+});
+</script>
+</body>
+</html>"""
+
+INDEX_GROUP_START_TEMPLATE = """
+    <div class="group">
+        <div class="group-header">File Group: {prefix} ({count} files)</div>
+        <div class="file-list">
+"""
+
+INDEX_GROUP_END = """
+        </div>
+    </div>
+"""
+
+INDEX_FILE_TEMPLATE = """
+            <div class="file-item"{sequence}>
+                <div class="file-name">{name}</div>
+                <div class="timestamp">
+                    Size: {size:,} bytes<br>
+                    Modified: {modified}
+                </div>
+                <a href="{name}" class="view-link">View Extracted Text</a>
+            </div>
+"""
+
+# Splits a file name at its first digit, e.g. EFTA00012 -> ("EFTA", "00012")
+SEQUENCE_RE = re.compile(r"(\D*)(.*)", re.DOTALL)
+
+@lru_cache(maxsize=None)
+def split_sequence_name(base_name):
+    """Split a file name into its letter prefix and number (None unless all the rest is digits)"""
+    prefix, rest = SEQUENCE_RE.match(base_name).groups()
+    return prefix, int(rest) if rest.isdigit() else None
 
 class PDFBoxReplacer:
     def __init__(self, root):
@@ -32,8 +433,30 @@ class PDFBoxReplacer:
         self.pdf_doc = None
         self.current_page = 0
         self.all_boxes = []
+        self._box_grid = {}  # (cell x, cell y) -> boxes overlapping that cell
+        self._box_dims = np.empty((0, 2), dtype=np.float32)  # See index_boxes
+        self._box_rects = np.empty((0, 4))  # See index_boxes
         self.selected_box = None
         self.zoom = 1.0  # Changed from 1.5 to 1.0
+        self._page_cache = OrderedDict()  # (page, zoom) -> PhotoImage
+        self._boxes_cache = {}  # page -> boxes found by find_boxes_on_page
+        self._lines_cache = {}  # See extract_lines_with_positions
+        self._doc_key = None  # Fingerprint of the open file for BOX_CACHE_PATH
+        self._modified_pages = set()  # Pages whose boxes no longer match the file
+        
+        # Pages are rendered on a worker thread (see load_page)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._load_seq = 0
+        self.photo = None
+        self._shown_page = None
+        self._shown_zoom = self.zoom
+        self._page_changes = 0
+        self._load_after = None  # Pending debounced load_page (see schedule_load)
+        self._shown_rect = None
+        self._shown_clip = None  # Rendered part of the page if not all of it
+        self._preview_source = None  # Last whole-page PIL render (see preview_zoom)
+        self._drawn_boxes = None  # all_boxes the outlines on the canvas are for
+        self._boxes_zoom = self.zoom  # Zoom they were drawn at
         
         self.setup_ui()
         
@@ -63,6 +486,8 @@ class PDFBoxReplacer:
         tk.Button(toolbar, text="White Overlay Export", command=self.export_overlay_white, 
                  bg="orange", fg="white").pack(side=tk.RIGHT, padx=2)
         
+        tk.Button(toolbar, text="Replace on All Pages", command=self.replace_all_pages, 
+                 bg="darkgreen", fg="white").pack(side=tk.RIGHT, padx=2)
         tk.Button(toolbar, text="Replace Boxes", command=self.replace_boxes, 
                  bg="green", fg="white").pack(side=tk.RIGHT, padx=2)
         tk.Button(toolbar, text="Unredact All", command=self.unredact_all, 
@@ -78,11 +503,13 @@ class PDFBoxReplacer:
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # Scrollbars
-        v_scroll = tk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=self.canvas.yview)
+        v_scroll = tk.Scrollbar(canvas_frame, orient=tk.VERTICAL,
+                                command=lambda *args: self.on_scroll(self.canvas.yview, *args))
         v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.canvas.configure(yscrollcommand=v_scroll.set)
         
-        h_scroll = tk.Scrollbar(self.root, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        h_scroll = tk.Scrollbar(self.root, orient=tk.HORIZONTAL,
+                                command=lambda *args: self.on_scroll(self.canvas.xview, *args))
         h_scroll.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
         self.canvas.configure(xscrollcommand=h_scroll.set)
         
@@ -91,6 +518,7 @@ class PDFBoxReplacer:
         self.canvas.bind("<MouseWheel>", self.on_mousewheel)  # Windows/Mac
         self.canvas.bind("<Button-4>", self.on_mousewheel)    # Linux scroll up
         self.canvas.bind("<Button-5>", self.on_mousewheel)    # Linux scroll down
+        self.canvas.bind("<Configure>", self.check_viewport)
         
         # Bind keyboard shortcuts
         self.root.bind("<Control-plus>", lambda e: self.zoom_in())
@@ -105,7 +533,7 @@ class PDFBoxReplacer:
 
     def auto_unredact(self):
         from tkinter import filedialog, messagebox
-        import os, re, tkinter as tk
+        import os, tkinter as tk
         from tkinter import ttk
 
         pdf_dir = filedialog.askdirectory(title="Select PDF Folder")
@@ -117,26 +545,29 @@ class PDFBoxReplacer:
             return
 
         os.makedirs(output_dir, exist_ok=True)
+        self.write_stylesheet(output_dir)
+        
+        # Names parsed for a previous run won't come up again
+        split_sequence_name.cache_clear()
 
-        pdf_files = []
-        for root, dirs, files in os.walk(pdf_dir):
-            for file in files:
-                if file.lower().endswith(".pdf"):
-                    pdf_files.append(os.path.join(root, file))
+        hidden_dirs = []
+        pdf_files = list(self.iter_pdf_files(pdf_dir, skipped=hidden_dirs))
 
         if not pdf_files:
-            messagebox.showerror("Error", "No PDF files found")
+            message = "No PDF files found"
+            if hidden_dirs:
+                message += f" (hidden folders are not searched, skipped {len(hidden_dirs)})"
+            messagebox.showerror("Error", message)
             return
 
-        pdf_files.sort()
+        # In the order of their pages' names, wherever they are in the
+        # folder tree, which is the order the pages link to each other in
+        pdf_files.sort(key=lambda p: (os.path.basename(p), p))
 
-        # Check if all files start with EFTA
-        efta_mode = False
-        if pdf_files:
-            # Get just the filenames without paths
-            filenames = [os.path.basename(f) for f in pdf_files]
-            # Check if ALL start with EFTA (case-insensitive)
-            efta_mode = all(fname.upper().startswith('EFTA') for fname in filenames)
+        # Check if ALL start with EFTA (case-insensitive); only the first four
+        # characters need upper-casing, and the check stops at the first
+        # file that doesn't
+        efta_mode = all(os.path.basename(f)[:4].upper() == 'EFTA' for f in pdf_files)
 
         # Then when creating the progress window:
         if efta_mode:
@@ -162,110 +593,127 @@ class PDFBoxReplacer:
 
         progress_window.update()
 
-        html_files = []
-        processed_count = 0
-        error_count = 0
-
-        # PASS 1 — Generate HTML
+        # PASS 1 — Generate HTML. Each PDF is turned into its page in a worker
+        # process, so every core gets used (MuPDF can only be used from one
+        # thread at a time) and the text never has to be sent back. The Tk
+        # thread just polls for progress. Workers are spawned rather than
+        # forked so they don't inherit the viewer's render thread mid-render
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                       mp_context=multiprocessing.get_context("spawn"))
+        queued = deque()  # (pdf_path, prev_file, next_file) not yet submitted
+        results = []  # (pdf_path, html_path or None, error or None)
+        index = self.load_unredact_index(output_dir)
+        stamps = {}
+        # Each page links straight to the pages of the PDFs either side of it
+        html_names = [os.path.splitext(os.path.basename(p))[0] + ".html" for p in pdf_files]
         for i, pdf_path in enumerate(pdf_files):
+            prev_file = html_names[i - 1] if i > 0 else None
+            next_file = html_names[i + 1] if i < len(pdf_files) - 1 else None
+            
+            # A PDF that is unchanged since it was last written to this folder,
+            # with the same neighbours, already has its page
             try:
+                stat = os.stat(pdf_path)
+                stamps[pdf_path] = [stat.st_size, stat.st_mtime_ns, prev_file, next_file]
+            except OSError:
+                pass
+            entry = index.get(pdf_path)
+            if entry and entry.get("stamp") == stamps.get(pdf_path):
+                html_path = os.path.join(output_dir, entry["html"])
+                if os.path.exists(html_path):
+                    results.append((pdf_path, html_path, None))
+                    continue
+            
+            queued.append((pdf_path, prev_file, next_file))
+        
+        pending = []  # (pdf_path, future) submitted and not collected yet
+        
+        def poll():
+            # Only keep AUTO_MAX_PENDING PDFs in flight, topping up as they
+            # finish, so a network share isn't asked for every file at once
+            while queued and len(pending) < AUTO_MAX_PENDING:
+                pdf_path, prev_file, next_file = queued.popleft()
+                pending.append((pdf_path, executor.submit(write_pdf_html, pdf_path, output_dir,
+                                                          prev_file, next_file)))
+            
+            # Collect and report the jobs that finished since the last poll,
+            # touching the widgets once per poll rather than once per file
+            finished = []
+            still_pending = []
+            for item in pending:
+                (finished if item[1].done() else still_pending).append(item)
+            if finished:
+                pending[:] = still_pending
+                for pdf_path, job in finished:
+                    try:
+                        html_path = job.result()
+                    except Exception as e:
+                        results.append((pdf_path, None, e))
+                        continue
+                    results.append((pdf_path, html_path, None))
+                    if html_path is not None and pdf_path in stamps:
+                        index[pdf_path] = {"stamp": stamps[pdf_path],
+                                           "html": os.path.basename(html_path)}
+                pdf_path = finished[-1][0]
                 if efta_mode:
                     status_label.config(text=f"Processing pedo-file: {os.path.basename(pdf_path)}")
                 else:
                     status_label.config(text=f"Processing: {os.path.basename(pdf_path)}")
-                progress_window.update()
-
-                text_by_page, ocr_mode = self.extract_text_from_pdf(pdf_path)
-                if not text_by_page:
-                    error_count += 1
-                    continue
-
-                # FIX: Get actual previous and next files
-                prev_file = None
-                next_file = None
-                
-                if i > 0:
-                    prev_pdf = pdf_files[i - 1]
-                    prev_file = os.path.splitext(os.path.basename(prev_pdf))[0] + ".html"
-                
-                if i < len(pdf_files) - 1:
-                    next_pdf = pdf_files[i + 1]
-                    next_file = os.path.splitext(os.path.basename(next_pdf))[0] + ".html"
-
-                html_path = self.create_html_from_text(
-                    pdf_path,
-                    text_by_page,
-                    ocr_mode,
-                    output_dir,
-                    prev_file=prev_file,  # Pass the actual previous file
-                    next_file=next_file   # Pass the actual next file
-                )
-
-                html_files.append(os.path.basename(html_path))
-                processed_count += 1
-
-                progress_var.set(i + 1)
-                progress_window.update()
+                progress_var.set(len(results))
+            
+            if pending or queued:
+                self.root.after(50, poll)
+            else:
+                executor.shutdown(wait=False)
+                self.finish_auto_unredact(results, pdf_files, html_names, output_dir,
+                                          progress_window, index, hidden_dirs)
+        
+        poll()
 
-            except Exception as e:
+    def finish_auto_unredact(self, results, pdf_files, html_names, output_dir, progress_window, index,
+                             hidden_dirs=()):
+        """Fix up navigation, write the index and report once all PDFs are done"""
+        html_by_pdf = {}
+        processed_count = 0
+        error_count = 0
+        
+        for pdf_path, html_path, error in results:
+            if error is not None:
                 error_count += 1
-                print(f"Error processing {pdf_path}: {e}")
-
-        html_files.sort()
-
-        # PASS 2 — Patch navigation
-        for i, name in enumerate(html_files):
-            path = os.path.join(output_dir, name)
-
-            prev_file = html_files[i - 1] if i > 0 else None
-            next_file = html_files[i + 1] if i < len(html_files) - 1 else None
-
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    html = f.read()
-
-                nav = '<div class="navigation"><div class="nav-buttons">'
-
-                if prev_file:
-                    nav += f'<a href="{prev_file}" class="nav-button prev">← Previous</a>'
-                else:
-                    nav += '<span class="nav-button disabled">← Previous</span>'
-
-                nav += '<a href="index.html" class="nav-button home">Index</a>'
-
-                if next_file:
-                    nav += f'<a href="{next_file}" class="nav-button next">Next →</a>'
-                else:
-                    nav += '<span class="nav-button disabled">Next →</span>'
-
-                nav += '</div></div>'
-
-                html = re.sub(
-                    r'<div class="navigation">.*?</div>\s*</div>',
-                    nav,
-                    html,
-                    flags=re.DOTALL
-                )
-
-                with open(path, "w", encoding="utf-8") as f:
-                    f.write(html)
-
-            except Exception as e:
-                print(f"Navigation update failed for {name}: {e}")
-
-        progress_window.destroy()
-
-        messagebox.showinfo(
-            "Done",
-            f"Processed: {processed_count}\nErrors: {error_count}"
-        )
+                log.error("Error processing %s: %s", pdf_path, error)
+                continue
+            
+            if html_path is None:
+                error_count += 1
+                continue
+            
+            html_by_pdf[pdf_path] = os.path.basename(html_path)
+            processed_count += 1
+
+        html_files = sorted(html_by_pdf.values())
+
+        # Pages were written linking to the PDFs either side of them; only
+        # where one of those didn't produce a page do the links need to skip
+        # past it. Those pages get written again on the next run
+        written = [i for i, pdf_path in enumerate(pdf_files) if pdf_path in html_by_pdf]
+        for n, i in enumerate(written):
+            prev_file = html_names[written[n - 1]] if n > 0 else None
+            next_file = html_names[written[n + 1]] if n < len(written) - 1 else None
+            planned_prev = html_names[i - 1] if i > 0 else None
+            planned_next = html_names[i + 1] if i < len(pdf_files) - 1 else None
+            if (prev_file, next_file) != (planned_prev, planned_next):
+                self.patch_navigation(os.path.join(output_dir, html_names[i]), prev_file, next_file)
+                index.pop(pdf_files[i], None)
+        
+        self.save_unredact_index(output_dir, index)
 
-        # Create index.html if we have HTML files
-        if html_files:
-            index_path = self.create_index_html(html_files, output_dir, processed_count, error_count)
-        
-        # Close progress window
-        progress_window.destroy()
+        try:
+            # Create index.html if we have HTML files
+            if html_files:
+                index_path = self.create_index_html(html_files, output_dir, processed_count, error_count)
+        finally:
+            # Close progress window, even if the index couldn't be written
+            progress_window.destroy()
         
         # Show results
         result_msg = f"""
@@ -278,6 +726,8 @@ HTML files saved to: {output_dir}
 """
         if html_files:
             result_msg += f"Index file: {index_path}"
+        if hidden_dirs:
+            result_msg += f"\nHidden folders skipped: {len(hidden_dirs)} (e.g. {hidden_dirs[0]})"
         
         messagebox.showinfo("Auto Unredact Complete", result_msg)
         
@@ -288,404 +738,165 @@ HTML files saved to: {output_dir}
 
 
 
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract all text from a PDF file"""
-        text_by_page = {}
-        ocr_mode = False
+    def load_unredact_index(self, output_dir):
+        """Read what a previous auto unredact into output_dir wrote (see UNREDACT_INDEX_NAME)"""
+        try:
+            with open(os.path.join(output_dir, UNREDACT_INDEX_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_unredact_index(self, output_dir, index):
+        """Record which PDFs have been written to output_dir"""
+        try:
+            with open(os.path.join(output_dir, UNREDACT_INDEX_NAME), "w", encoding="utf-8") as f:
+                json.dump(index, f)
+        except OSError as e:
+            log.warning("Could not save %s: %s", UNREDACT_INDEX_NAME, e)
+
+    def iter_pdf_files(self, directory, seen=None, skipped=None):
+        """Yield the paths of all PDFs under a directory, recursively (hidden folders go in skipped)"""
+        # Symlinked directories are followed too; remember every directory
+        # visited by device and inode so link cycles are only entered once
+        if seen is None:
+            try:
+                st = os.stat(directory)
+                seen = {(st.st_dev, st.st_ino)}
+            except OSError:
+                seen = set()
         
+        # scandir hands back each entry's type along with its name, so unlike
+        # os.walk + os.path.join this doesn't stat or build a path per file
         try:
-            pdf_doc = fitz.open(pdf_path)
-            
-            for page_num in range(len(pdf_doc)):
-                page = pdf_doc[page_num]
-                
-                # Check if page has actual text or just images
-                text_dict = page.get_text("dict")
-                
-                # Count text blocks vs image blocks
-                text_blocks = sum(1 for block in text_dict.get("blocks", []) if block.get("type") == 0)
-                image_blocks = sum(1 for block in text_dict.get("blocks", []) if block.get("type") == 1)
-                
-                # If mostly/only images, it's OCR mode
-                if image_blocks > 0 and text_blocks == 0:
-                    ocr_mode = True
-                
-                # Extract text
-                text = page.get_text("text")
-                
-                if text.strip():
-                    text_by_page[page_num + 1] = text.strip()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Hidden folders (.git, .Trash, caches...) can be huge
+                        # and don't hold the documents being looked for
+                        if entry.name.startswith("."):
+                            log.info("Skipping hidden folder %s", entry.path)
+                            if skipped is not None:
+                                skipped.append(entry.path)
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        key = (st.st_dev, st.st_ino)
+                        if key not in seen:
+                            seen.add(key)
+                            yield from self.iter_pdf_files(entry.path, seen, skipped)
+                    elif entry.name[-4:].lower() == ".pdf":
+                        yield entry.path
+        except OSError as e:
+            log.warning("Skipping %s: %s", directory, e)
+
+    def write_stylesheet(self, output_dir):
+        """Write the style.css linked from the index and every page"""
+        with open(os.path.join(output_dir, "style.css"), 'w', encoding='utf-8') as f:
+            f.write(STYLESHEET_CSS)
+
+    def patch_navigation(self, html_path, prev_file, next_file):
+        """Point an already written page at different neighbours"""
+        nav_html, adjacent = navigation_html(prev_file, next_file)
+        try:
+            with open(html_path, "r", encoding="utf-8") as f:
+                page = f.read()
             
-            pdf_doc.close()
+            page = NAV_RE.sub(lambda m: nav_html.strip(), page)
+            page = ADJACENT_RE.sub(lambda m: m.group(1) + adjacent + m.group(2), page)
             
+            with open(html_path, "w", encoding="utf-8") as f:
+                f.write(page)
         except Exception as e:
-            print(f"Error extracting text from {pdf_path}: {str(e)}")
-        
-        return text_by_page, ocr_mode
-
-    def create_html_from_text(self, pdf_path, text_by_page, ocr_mode, output_dir, prev_file=None, next_file=None):
-        """Create an HTML file from extracted text with Next/Previous navigation"""
-        pdf_name = os.path.basename(pdf_path)
-        html_name = os.path.splitext(pdf_name)[0] + ".html"
-        html_path = os.path.join(output_dir, html_name)
-        
-        print(prev_file, next_file)
-        
-        # Create navigation buttons HTML - ALWAYS create them
-        nav_html = """
-        <div class="navigation">
-            <div class="nav-buttons">
-    """
-        if prev_file:
-            # ALWAYS create Previous button, even if file doesn't exist yet
-            nav_html += f"""            <a href="{html.escape(prev_file)}" class="nav-button prev">← Previous File</a>
-    """
-        else:
-            nav_html += f"""            <span class="nav-button disabled">← No Previous</span>
-    """
-        
-        nav_html += f"""            <a href="index.html" class="nav-button home">Index</a>
-    """
-        
-        if next_file:
-            # ALWAYS create Next button, even if file doesn't exist yet
-            nav_html += f"""            <a href="{html.escape(next_file)}" class="nav-button next">Next File →</a>
-    """
-        else:
-            nav_html += f"""            <span class="nav-button disabled">No Next →</span>
-    """
-        
-        nav_html += """        </div>
-        </div>
-    """
-        
-        # Create HTML content
-        html_content = f"""<!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Extracted Text: {html.escape(pdf_name)}</title>
-        <link rel="stylesheet" type="text/css" href="style.css">
-    </head>
-    <body>
-        <div class="header">
-            <h1>Extracted Text: {html.escape(pdf_name)}</h1>
-            <p>Original PDF: {html.escape(pdf_path)}</p>
-            <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        </div>
-        
-        <div class="file-info">
-            <p><strong>Source:</strong> {html.escape(pdf_path)}</p>
-            <p><strong>Pages:</strong> {len(text_by_page)}</p>
-            <p><strong>Extraction Method:</strong> {"OCR (Image-based extraction)" if ocr_mode else "Text layer extraction"}</p>
-        </div>
-        
-        {nav_html}
-        
-        <div class="sequence-info">
-            <p><strong>File Sequence:</strong> {html.escape(pdf_name)}</p>
-            <p><strong>Adjacent Files:</strong> 
-    """
-        
-        if prev_file:
-            html_content += f"""Previous: <code>{html.escape(prev_file)}</code><br>"""
-        if next_file:
-            html_content += f"""Next: <code>{html.escape(next_file)}</code>"""
-        
-        html_content += f"""</p>
-        </div>
-    """
-        
-        if ocr_mode is False:
-            html_content += """
-        <div class="warning">
-            <strong>⚠️ WARNING:</strong> This PDF has no text stream - using OCR (may have errors).
-            The PDF was converted to images, likely to hide the text layer.
-        </div>
-    """
-        
-        # Add each page
-        for page_num in sorted(text_by_page.keys()):
-            escaped_text = html.escape(text_by_page[page_num])
-            html_content += f"""
-        <div class="page">
-            <div class="page-header">Page {page_num}</div>
-            <div class="page-content">{escaped_text}</div>
-        </div>
-    """
-        
-        # BOTTOM NAVIGATION (same as top)
-        html_content += nav_html
-        
-        html_content += """
-    </body>
-    </html>"""
-        
-        # Write HTML file
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        return html_path
-
+            log.error("Navigation update failed for %s: %s", html_path, e)
 
     def create_index_html(self, html_files, output_dir, processed_count, error_count):
         """Create an index.html file linking to all HTML files with sequence information"""
         index_path = os.path.join(output_dir, "index.html")
         
-        # Sort HTML files by their numerical sequence
-        def get_sequence_key(filename):
-            base_name = os.path.splitext(filename)[0]
-            
-            # Find the split between letters and numbers
-            split_index = len(base_name)
-            for i, char in enumerate(base_name):
-                if char.isdigit():
-                    split_index = i
-                    break
-            
-            prefix = base_name[:split_index] if split_index > 0 else ""
-            number_str = base_name[split_index:] if split_index < len(base_name) else ""
-            
-            if number_str.isdigit():
-                return (prefix, int(number_str))
-            return (base_name, 0)
-        
-        # Make sure we're working with basenames
-        html_files = [os.path.basename(f) for f in html_files]
-        html_files.sort(key=lambda x: get_sequence_key(x))
-        
-        # Group files by prefix
-        file_groups = {}
+        # Parse each file name once into its group and sequence key: files
+        # sort by (prefix, number), or by their name if they don't end in one
+        decorated = []
         for html_file in html_files:
-            filename = html_file
+            # Make sure we're working with basenames
+            filename = os.path.basename(html_file)
             base_name = os.path.splitext(filename)[0]
             
             # Find the split between letters and numbers
-            split_index = len(base_name)
-            for i, char in enumerate(base_name):
-                if char.isdigit():
-                    split_index = i
-                    break
-            
-            prefix = base_name[:split_index] if split_index > 0 else "Other"
-            
-            if prefix not in file_groups:
-                file_groups[prefix] = []
+            prefix, number = split_sequence_name(base_name)
+            if number is not None:
+                sequence_key = (prefix, number)
+            else:
+                sequence_key = (base_name, 0)
             
-            # Store full path for file operations
-            full_path = os.path.join(output_dir, filename)
-            file_groups[prefix].append({
-                'filename': filename,
-                'full_path': full_path,
-                'basename': base_name
-            })
-        
-        # Create index HTML
-        html_content = f"""<!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Extracted PDF Text - Index</title>
-        <style>
-        body {{
-            font-family: Arial, sans-serif;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-            line-height: 1.6;
-            background-color: #f5f5f5;
-        }}
-        .header {{
-            background-color: #2c3e50;
-            color: white;
-            padding: 20px;
-            border-radius: 5px;
-            margin-bottom: 20px;
-        }}
-        .stats {{
-            background-color: #e8f4fc;
-            padding: 15px;
-            border-radius: 5px;
-            margin-bottom: 20px;
-            display: flex;
-            justify-content: space-between;
-            flex-wrap: wrap;
-        }}
-        .stat-box {{
-            background-color: white;
-            padding: 10px 20px;
-            border-radius: 5px;
-            margin: 5px;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        }}
-        .group {{
-            background-color: white;
-            padding: 20px;
-            border-radius: 5px;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-            margin-bottom: 30px;
-        }}
-        .group-header {{
-            background-color: #3498db;
-            color: white;
-            padding: 10px 15px;
-            margin: -20px -20px 20px -20px;
-            border-radius: 5px 5px 0 0;
-            font-weight: bold;
-            font-size: 18px;
-        }}
-        .file-list {{
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-            gap: 15px;
-        }}
-        .file-item {{
-            padding: 15px;
-            border: 1px solid #eee;
-            border-radius: 5px;
-            background-color: #f8f9fa;
-            transition: transform 0.2s, box-shadow 0.2s;
-        }}
-        .file-item:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-            background-color: #e8f4fc;
-        }}
-        .file-name {{
-            font-weight: bold;
-            color: #2c3e50;
-            font-size: 16px;
-            margin-bottom: 5px;
-        }}
-        .view-link {{
-            display: inline-block;
-            background-color: #27ae60;
-            color: white;
-            padding: 8px 15px;
-            text-decoration: none;
-            border-radius: 3px;
-            font-size: 14px;
-            margin-top: 10px;
-        }}
-        .view-link:hover {{
-            background-color: #229954;
-        }}
-        .timestamp {{
-            color: #666;
-            font-size: 12px;
-        }}
-        .sequence-nav {{
-            display: flex;
-            justify-content: space-between;
-            margin-top: 15px;
-            font-size: 12px;
-            color: #666;
-        }}
-        .nav-hint {{
-            background-color: #f8f9fa;
-            padding: 10px;
-            border-radius: 5px;
-            margin-bottom: 20px;
-            border-left: 4px solid #27ae60;
-            font-size: 14px;
-        }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Extracted PDF Text - Index</h1>
-            <p>Browse all extracted text from PDF files with sequential navigation</p>
-        </div>
+            decorated.append((prefix or "Other", sequence_key[1], sequence_key, filename))
         
-        <div class="stats">
-            <div class="stat-box">
-                <strong>Total Files:</strong> {len(html_files)}
-            </div>
-            <div class="stat-box">
-                <strong>Successfully Processed:</strong> {processed_count}
-            </div>
-            <div class="stat-box">
-                <strong>Failed:</strong> {error_count}
-            </div>
-            <div class="stat-box">
-                <strong>File Groups:</strong> {len(file_groups)}
-            </div>
-            <div class="stat-box">
-                <strong>Generated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            </div>
-        </div>
+        # Sort by group, then by number within the group (ties in sequence
+        # order), so each group comes out as one ordered run
+        decorated.sort(key=itemgetter(0, 1, 2))
+        group_count = len(set(map(itemgetter(0), decorated)))
         
-        <div class="nav-hint">
-            <strong>💡 Navigation Tip:</strong> In individual file views, use the Previous/Next buttons at the top and bottom to navigate through sequential files. Files are automatically linked by their numerical sequence (e.g., EFTA0000000001 → EFTA0000000002).
-        </div>
-    """
-        
-        # Add each group
-        for prefix, files in sorted(file_groups.items()):
-            # Sort files within group by their numerical value
-            files.sort(key=lambda x: get_sequence_key(x['filename'])[1])
-            
-            html_content += f"""
-        <div class="group">
-            <div class="group-header">File Group: {html.escape(prefix)} ({len(files)} files)</div>
-            <div class="file-list">
-    """
+        # Stat everything in the output folder in one directory scan rather
+        # than with a getsize and a getmtime call per file
+        stats_by_name = {}
+        try:
+            with os.scandir(output_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stats_by_name[entry.name] = entry.stat()
+        except OSError as e:
+            log.warning("Could not scan %s: %s", output_dir, e)
+        
+        # Write the index as it is generated instead of building it all in
+        # memory first
+        with open(index_path, 'w', encoding='utf-8', buffering=HTML_WRITE_BUFFER) as f:
+            f.write(INDEX_HEAD_TEMPLATE.format(
+                total=len(decorated),
+                processed=processed_count,
+                failed=error_count,
+                groups=group_count,
+                generated=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ))
             
-            for i, file_info in enumerate(files):
-                file_name = file_info['filename']
-                file_path = file_info['full_path']
+            # Add each group straight from the sorted list, only holding one
+            # group's names at a time
+            for prefix, group in groupby(decorated, key=itemgetter(0)):
+                files = [entry[3] for entry in group]
+                f.write(INDEX_GROUP_START_TEMPLATE.format(prefix=html.escape(prefix), count=len(files)))
                 
-                # Get file stats (with error handling in case file doesn't exist)
-                try:
-                    file_size = os.path.getsize(file_path)
-                    modified_time = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d %H:%M')
-                except (FileNotFoundError, OSError):
-                    file_size = 0
-                    modified_time = "N/A"
+                # Each name shows up as a file and as its neighbours' links,
+                # so escape it once up front
+                escaped = [html.escape(name) for name in files]
                 
-                # Determine next/previous in sequence for this group
-                prev_in_group = files[i-1]['filename'] if i > 0 else None
-                next_in_group = files[i+1]['filename'] if i < len(files)-1 else None
-                
-                html_content += f"""
-                <div class="file-item">
-                    <div class="file-name">{html.escape(file_name)}</div>
-                    <div class="timestamp">
-                        Size: {file_size:,} bytes<br>
-                        Modified: {modified_time}
-                    </div>
-    """
-                
-                if prev_in_group or next_in_group:
-                    html_content += f"""            <div class="sequence-nav">
-    """
+                # Walk the group as (previous, file, next) triples
+                for prev_in_group, file_name, esc_name, next_in_group in zip([None] + escaped[:-1], files,
+                                                                             escaped, escaped[1:] + [None]):
+                    # Get file stats (in case the file doesn't exist)
+                    stat = stats_by_name.get(file_name)
+                    if stat is not None:
+                        file_size = stat.st_size
+                        modified_time = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
+                    else:
+                        file_size = 0
+                        modified_time = "N/A"
+                    
+                    # Link the next/previous in sequence for this group
+                    sequence = ""
                     if prev_in_group:
-                        html_content += f"""                <span>← {html.escape(prev_in_group)}</span>
-    """
+                        sequence += f' data-prev="{prev_in_group}"'
                     if next_in_group:
-                        html_content += f"""                <span>{html.escape(next_in_group)} →</span>
-    """
-                    html_content += """            </div>
-    """
-                
-                html_content += f"""            <a href="{html.escape(file_name)}" class="view-link">View Extracted Text</a>
-                </div>
-    """
+                        sequence += f' data-next="{next_in_group}"'
+                    
+                    f.write(INDEX_FILE_TEMPLATE.format(
+                        name=esc_name,
+                        size=file_size,
+                        modified=modified_time,
+                        sequence=sequence
+                    ))
+                f.write(INDEX_GROUP_END)
             
-            html_content += """
-            </div>
-        </div>
-    """
-        
-        html_content += """
-    </body>
-    </html>"""
-        
-        # Write index file
-        with open(index_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+            f.write(INDEX_FOOT)
         
         return index_path
 
@@ -699,28 +910,19 @@ HTML files saved to: {output_dir}
         ocr_mode = False
         
         # Scan all pages
-        for page_num in range(len(self.pdf_doc)):
-            page = self.pdf_doc[page_num]
-            
-            # Check if page has actual text or just images
-            text_dict = page.get_text("dict")
-            
-            # Count text blocks vs image blocks
-            text_blocks = sum(1 for block in text_dict.get("blocks", []) if block.get("type") == 0)
-            image_blocks = sum(1 for block in text_dict.get("blocks", []) if block.get("type") == 1)
-            
-            print(f"Page {page_num + 1}: text_blocks={text_blocks}, image_blocks={image_blocks}")
-            
-            # If mostly/only images, it's OCR mode
-            if image_blocks > 0 and text_blocks == 0:
-                ocr_mode = True
-                print(f"  -> OCR mode detected")
-            
-            # Extract text (will use OCR if no text layer exists)
-            text = page.get_text("text")
-            
-            if text.strip():
-                results_by_page[page_num + 1] = text.strip()
+        with MUPDF_LOCK:
+            for page_num in range(len(self.pdf_doc)):
+                page = self.pdf_doc[page_num]
+                
+                # Extract text (will use OCR if no text layer exists)
+                text = page.get_text("text", flags=TEXT_FLAGS).strip()
+                
+                # Only a page without text needs checking for images; if it
+                # has any, it's OCR mode
+                if text:
+                    results_by_page[page_num + 1] = text
+                elif page.get_images():
+                    ocr_mode = True
         
         # Display results with warning if OCR was used
         self.show_unredacted_results(results_by_page, ocr_mode)
@@ -742,19 +944,18 @@ HTML files saved to: {output_dir}
         text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.config(command=text_widget.yview)
         
-        # Format and display results
+        # Format the results and insert them in one go, every insert makes
+        # the text widget redo its layout
         if results_by_page:
-            text_widget.insert(tk.END, f"Extracted text from {len(results_by_page)} pages\n")
+            parts = [f"Extracted text from {len(results_by_page)} pages\n"]
             if ocr_mode is False:
-                text_widget.insert(tk.END, "⚠️ WARNING: This PDF has no text stream - using OCR (may have errors)\n")
-                text_widget.insert(tk.END, "The PDF was converted to images, likely to hide the text layer.\n")
-            text_widget.insert(tk.END, "="*80 + "\n\n")
+                parts.append("⚠️ WARNING: This PDF has no text stream - using OCR (may have errors)\n")
+                parts.append("The PDF was converted to images, likely to hide the text layer.\n")
+            parts.append("="*80 + "\n\n")
             
             for page_num in sorted(results_by_page.keys()):
-                text_widget.insert(tk.END, f"PAGE {page_num}:\n")
-                text_widget.insert(tk.END, "-"*80 + "\n")
-                text_widget.insert(tk.END, results_by_page[page_num])
-                text_widget.insert(tk.END, "\n\n")
+                parts.append(f"PAGE {page_num}:\n{'-'*80}\n{results_by_page[page_num]}\n\n")
+            text_widget.insert(tk.END, "".join(parts))
         else:
             text_widget.insert(tk.END, "No text found in document.")
         
@@ -771,12 +972,8 @@ HTML files saved to: {output_dir}
 
     def copy_to_clipboard(self, results_by_page):
         """Copy all extracted text to clipboard"""
-        all_text = ""
-        for page_num in sorted(results_by_page.keys()):
-            all_text += f"PAGE {page_num}:\n"
-            all_text += "-"*80 + "\n"
-            all_text += results_by_page[page_num]
-            all_text += "\n\n"
+        all_text = "".join(f"PAGE {page_num}:\n{'-'*80}\n{results_by_page[page_num]}\n\n"
+                           for page_num in sorted(results_by_page.keys()))
         
         self.root.clipboard_clear()
         self.root.clipboard_append(all_text)
@@ -791,17 +988,21 @@ HTML files saved to: {output_dir}
         )
         
         if filepath:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"Extracted Text Report - {len(results_by_page)} pages\n")
-                f.write("="*80 + "\n\n")
-                
-                for page_num in sorted(results_by_page.keys()):
-                    f.write(f"PAGE {page_num}:\n")
-                    f.write("-"*80 + "\n")
-                    f.write(results_by_page[page_num])
-                    f.write("\n\n")
+            # Write the file on the worker thread so a big report doesn't
+            # freeze the window, from a copy in case the results change
+            job = self._executor.submit(self.write_results, filepath, dict(results_by_page))
+            self.after_done(job, lambda path: messagebox.showinfo("Success", f"Exported to {path}"))
+
+    def write_results(self, filepath, results_by_page):
+        """Write the extracted text report (runs on the worker thread)"""
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(f"Extracted Text Report - {len(results_by_page)} pages\n")
+            f.write("="*80 + "\n\n")
             
-            messagebox.showinfo("Success", f"Exported to {filepath}")
+            f.writelines(f"PAGE {page_num}:\n{'-'*80}\n{results_by_page[page_num]}\n\n"
+                         for page_num in sorted(results_by_page.keys()))
+        
+        return filepath
 
     def on_mousewheel(self, event):
         """Handle mouse wheel zoom with Ctrl held"""
@@ -814,14 +1015,36 @@ HTML files saved to: {output_dir}
     
     def zoom_in(self):
         """Increase zoom level"""
-        self.zoom = min(self.zoom * 1.25, 5.0)  # Max 500%
+        self.zoom = self.zoom_step(1)  # Stops at the top of ZOOM_LEVELS
         self.zoom_label.config(text=f"Zoom: {int(self.zoom * 100)}%")
-        self.load_page()
+        self.preview_zoom()
+        self.schedule_load()
     
     def zoom_out(self):
         """Decrease zoom level"""
-        self.zoom = max(self.zoom / 1.25, 0.25)  # Min 25%
+        self.zoom = self.zoom_step(-1)  # Stops at the bottom of ZOOM_LEVELS
         self.zoom_label.config(text=f"Zoom: {int(self.zoom * 100)}%")
+        self.preview_zoom()
+        self.schedule_load()
+    
+    def zoom_step(self, direction):
+        """The next zoom level above (direction 1) or below (-1) the current zoom"""
+        # The current zoom can be off the ladder after fitting the width;
+        # the next step lands back on it
+        if direction > 0:
+            return next((z for z in ZOOM_LEVELS if z > self.zoom + 1e-6), ZOOM_LEVELS[-1])
+        return next((z for z in reversed(ZOOM_LEVELS) if z < self.zoom - 1e-6), ZOOM_LEVELS[0])
+    
+    def schedule_load(self):
+        """Re-render shortly, coalescing bursts of zoom/scroll/page changes"""
+        # Mouse-wheel zooming and held-down page keys fire many steps in a
+        # row; only the last one needs to be rendered
+        if self._load_after is not None:
+            self.root.after_cancel(self._load_after)
+        self._load_after = self.root.after(ZOOM_DEBOUNCE_MS, self.delayed_load)
+    
+    def delayed_load(self):
+        self._load_after = None
         self.load_page()
     
     def zoom_fit_width(self):
@@ -829,14 +1052,15 @@ HTML files saved to: {output_dir}
         if not self.pdf_doc:
             return
         
-        page = self.pdf_doc[self.current_page]
+        with MUPDF_LOCK:
+            page_width = self.pdf_doc[self.current_page].rect.width
         canvas_width = self.canvas.winfo_width()
-        page_width = page.rect.width
         
         self.zoom = (canvas_width - 20) / page_width  # 20px padding
         self.zoom = max(0.25, min(self.zoom, 5.0))  # Clamp between 25% and 500%
         self.zoom_label.config(text=f"Zoom: {int(self.zoom * 100)}%")
-        self.load_page()
+        self.preview_zoom()
+        self.schedule_load()
         
     def open_pdf(self):
         filepath = filedialog.askopenfilename(
@@ -846,7 +1070,13 @@ HTML files saved to: {output_dir}
         
         if filepath:
             try:
-                self.pdf_doc = fitz.open(filepath)
+                with MUPDF_LOCK:
+                    self.pdf_doc = fitz.open(filepath)
+                    self._boxes_cache.clear()
+                    self._modified_pages.clear()
+                    self._doc_key = self.file_key(filepath)
+                self._page_cache.clear()
+                self._lines_cache.clear()
                 self.current_page = 0
                 self.selected_box = None
                 self.status_label.config(text=f"Loaded: {filepath}")
@@ -868,7 +1098,15 @@ HTML files saved to: {output_dir}
         
         if output_path:
             try:
-                self.pdf_doc.save(output_path)
+                with MUPDF_LOCK:
+                    # Saving over the opened file only appends the changes,
+                    # anything else is written out without garbage collection
+                    same_file = os.path.abspath(output_path) == os.path.abspath(self.pdf_doc.name)
+                    if same_file and self.pdf_doc.can_save_incrementally():
+                        self.pdf_doc.save(output_path, incremental=True,
+                                          encryption=fitz.PDF_ENCRYPT_KEEP)
+                    else:
+                        self.pdf_doc.save(output_path, garbage=0, deflate=True)
                 messagebox.showinfo("Success", f"Saved to: {output_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save: {str(e)}")
@@ -877,201 +1115,366 @@ HTML files saved to: {output_dir}
         if not self.pdf_doc:
             return
         
-        # Store current scroll position
-        x_scroll = self.canvas.xview()[0]
-        y_scroll = self.canvas.yview()[0]
+        # A direct load covers whatever schedule_load still had pending
+        if self._load_after is not None:
+            self.root.after_cancel(self._load_after)
+            self._load_after = None
         
-        page = self.pdf_doc[self.current_page]
         self.page_label.config(text=f"Page {self.current_page + 1} of {len(self.pdf_doc)}")
         
-        # Find all boxes on current page
-        self.find_boxes_on_page(page)
+        if self.current_page != self._shown_page:
+            # The boxes we have belong to the page we are leaving
+            self.all_boxes = []
+            self.index_boxes()
+        
+        # Reuse a previous render of this page/zoom if we have one
+        key = (self.current_page, round(self.zoom, 3))
+        photo = self._page_cache.get(key)
+        if photo is not None:
+            self._page_cache.move_to_end(key)
+        
+        # Rendering and box detection run on the worker thread so the window
+        # stays responsive; results for a page/zoom we have since moved away
+        # from are dropped when they arrive
+        view = (self.canvas.xview()[0], self.canvas.yview()[0],
+                self.canvas.winfo_width(), self.canvas.winfo_height())
+        self._load_seq += 1
+        job = self._executor.submit(self.render_page, self.pdf_doc, self.current_page,
+                                    self.zoom, photo is None, view)
+        self.after_done(job, self.show_page, self._load_seq, photo)
+        
+        # Detection is a separate job queued behind the render, so the page
+        # is up on screen while a slow scan for boxes is still running
+        job = self._executor.submit(self.detect_boxes, self.pdf_doc, self.current_page)
+        self.after_done(job, self.show_boxes, self._load_seq, self.current_page)
+    
+    def detect_boxes(self, pdf_doc, page_num):
+        """Find the boxes on a page (runs on the worker thread)"""
+        with MUPDF_LOCK:
+            # Box geometry doesn't depend on zoom, so each page is only
+            # scanned once (until it gets modified)
+            boxes = self._boxes_cache.get(page_num)
+            if boxes is None:
+                boxes = self._boxes_cache[page_num] = self.load_boxes(pdf_doc[page_num])
+        return boxes
+    
+    def render_page(self, pdf_doc, page_num, zoom, render=True, view=None):
+        """Render a page (runs on the worker thread)"""
+        with MUPDF_LOCK:
+            page = pdf_doc[page_num]
+            page_rect = page.rect
+            
+            img = None
+            origin = (0, 0)
+            clip = None
+            if render:
+                # At high zoom only render what is scrolled into view (with
+                # half a screen of margin around it) instead of the whole page
+                if view and page_rect.width * page_rect.height * zoom * zoom > FULL_RENDER_MAX_PIXELS:
+                    x_frac, y_frac, view_width, view_height = view
+                    view_width, view_height = view_width / zoom, view_height / zoom
+                    x0 = x_frac * page_rect.width
+                    y0 = y_frac * page_rect.height
+                    clip = fitz.Rect(x0 - view_width / 2, y0 - view_height / 2,
+                                     x0 + view_width * 1.5, y0 + view_height * 1.5) & page_rect
+                
+                mat = fitz.Matrix(zoom, zoom)
+                pix = page.get_pixmap(matrix=mat, alpha=False, clip=clip)
+                
+                # Hand the raw RGB samples straight to PIL, no PNG encode/decode.
+                # samples_mv is a view of the pixmap's own buffer, so PIL
+                # copies it once instead of after a copy into a bytes object
+                img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples_mv)
+                origin = (pix.x, pix.y)
+                pix = None
+            
+            # MuPDF's store is unbounded by default; we keep our own render cache,
+            # so let it drop decoded images/pixmaps instead of growing forever
+            fitz.TOOLS.store_shrink(100)
+        
+        return {
+            "page": page_num,
+            "zoom": zoom,
+            "page_rect": page_rect,
+            "image": img,
+            "origin": origin,
+            "clip": clip
+        }
+    
+    def show_page(self, result, seq, photo=None):
+        """Put a page rendered by render_page on the canvas"""
+        if seq != self._load_seq:
+            return  # Superseded by a newer load_page
+        
+        zoom = result["zoom"]
+        
+        # PhotoImages have to be created on the Tk thread. Partial renders
+        # depend on the scroll position, so only whole pages are cached
+        old_photos = [self.photo]
+        if result["image"] is not None:
+            photo = ImageTk.PhotoImage(result["image"])
+            if result["clip"] is None:
+                old_photos += self.cache_page((result["page"], round(zoom, 3)), photo)
+        self.photo = photo
+        
+        if result["page"] != self._shown_page:
+            self._page_changes += 1
+            if self._page_changes % GC_EVERY_PAGES == 0:
+                gc.collect()
+            self._preview_source = None
+        self._shown_page = result["page"]
+        self._shown_zoom = zoom
+        self._shown_rect = result["page_rect"]
+        self._shown_clip = result["clip"]
+        
+        # Keep the last whole-page render around to stretch for zoom previews
+        if result["image"] is not None and result["clip"] is None:
+            self._preview_source = result["image"]
+        
+        self.display_photo(old_photos, result["origin"])
+        self.prefetch_neighbours()
+    
+    def prefetch_neighbours(self):
+        """Queue renders of the pages either side, and of this page one zoom step in/out"""
+        targets = [(self.current_page + 1, self.zoom), (self.current_page - 1, self.zoom),
+                   (self.current_page, self.zoom_step(1)), (self.current_page, self.zoom_step(-1))]
+        for page_num, zoom in targets:
+            if 0 <= page_num < len(self.pdf_doc) and (page_num, round(zoom, 3)) not in self._page_cache:
+                job = self._executor.submit(self.prefetch_page, self.pdf_doc, page_num,
+                                            zoom, self._load_seq)
+                self.after_done(job, self.store_prefetch, self._load_seq)
+    
+    def prefetch_page(self, pdf_doc, page_num, zoom, seq):
+        """Detect boxes and render a page ahead of time (runs on the worker thread)"""
+        with MUPDF_LOCK:
+            # Don't let prefetches pile up in front of real loads while
+            # paging quickly, or run for a document that was closed
+            if seq != self._load_seq or pdf_doc is not self.pdf_doc:
+                return None
+            
+            self.detect_boxes(pdf_doc, page_num)
+            
+            # Only whole pages get cached, so skip pages too big to render whole
+            page_rect = pdf_doc[page_num].rect
+            if page_rect.width * page_rect.height * zoom * zoom > FULL_RENDER_MAX_PIXELS:
+                return None
+            return self.render_page(pdf_doc, page_num, zoom)
+    
+    def store_prefetch(self, result, seq):
+        """Put a page rendered by prefetch_page in the render cache"""
+        if result is None or seq != self._load_seq:
+            return  # Nothing rendered, or the page may have changed since
         
-        # Render page
-        mat = fitz.Matrix(self.zoom, self.zoom)
-        pix = page.get_pixmap(matrix=mat)
-        img_data = pix.tobytes("png")
+        key = (result["page"], round(result["zoom"], 3))
+        if key in self._page_cache:
+            return
+        for old in self.cache_page(key, ImageTk.PhotoImage(result["image"])):
+            if old is not self.photo:
+                self.root.tk.call("image", "delete", str(old))
+    
+    def cache_page(self, key, photo):
+        """Add a render to the page cache, returning the renders it pushed out"""
+        self._page_cache[key] = photo
+        size = sum(p.width() * p.height() * 4 for p in self._page_cache.values())
+        evicted = []
+        # Always keep the newest render, however big it is
+        while len(self._page_cache) > 1 and (len(self._page_cache) > PAGE_CACHE_SIZE
+                                             or size > PAGE_CACHE_MAX_BYTES):
+            old = self._page_cache.popitem(last=False)[1]
+            size -= old.width() * old.height() * 4
+            evicted.append(old)
+        return evicted
+    
+    def show_boxes(self, boxes, seq, page_num):
+        """Take the boxes found by detect_boxes, drawing them if their page is up"""
+        if seq != self._load_seq:
+            return  # Superseded by a newer load_page
         
-        img = Image.open(io.BytesIO(img_data))
-        self.photo = ImageTk.PhotoImage(img)
+        self.all_boxes = boxes
+        self.index_boxes()
         
-        # Clear canvas and display image
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
+        # Otherwise show_page draws them along with the page
+        if self._shown_page == page_num:
+            self.sync_boxes()
+    
+    def preview_zoom(self):
+        """Stretch the last render to the new zoom while the real render is pending"""
+        if self._preview_source is None:
+            return
+        
+        width = round(self._shown_rect.width * self.zoom)
+        height = round(self._shown_rect.height * self.zoom)
+        if width * height > FULL_RENDER_MAX_PIXELS:
+            return  # Would cost about as much as rendering it
+        
+        old_photos = [self.photo]
+        self.photo = ImageTk.PhotoImage(self._preview_source.resize((width, height), Image.BILINEAR))
+        self._shown_zoom = self.zoom
+        self._shown_clip = None
+        self.display_photo(old_photos)
+    
+    def display_photo(self, old_photos, origin=(0, 0)):
+        """Show self.photo and the boxes on the canvas at the shown zoom"""
+        # Store current scroll position
+        x_scroll = self.canvas.xview()[0]
+        y_scroll = self.canvas.yview()[0]
+        
+        # Swap the page image, keeping it under the box outlines
+        self.canvas.delete("page")
+        self.canvas.create_image(*origin, anchor=tk.NW, image=self.photo, tags="page")
+        self.canvas.tag_lower("page")
+        
+        # Free the pixel buffers of images nothing shows or caches anymore
+        # right away instead of whenever the PhotoImage object gets collected
+        for old in old_photos:
+            if old is not None and old is not self.photo and old not in self._page_cache.values():
+                self.root.tk.call("image", "delete", str(old))
         
         # Draw boxes on canvas
-        self.draw_boxes()
+        self.sync_boxes()
         
-        # Update scroll region
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        # The scroll region always spans the whole page, even when only part
+        # of it has been rendered
+        zoom = self._shown_zoom
+        self.canvas.configure(scrollregion=(0, 0, self._shown_rect.width * zoom,
+                                            self._shown_rect.height * zoom))
         
         # Restore scroll position
         self.canvas.xview_moveto(x_scroll)
         self.canvas.yview_moveto(y_scroll)
     
-    def find_boxes_on_page(self, page):
-        """Find all black rectangles on the page using image processing"""
-        self.all_boxes = []
-        
-        # Render page to image
-        mat = fitz.Matrix(2, 2)  # Higher resolution for better detection
-        pix = page.get_pixmap(matrix=mat)
-        img_data = pix.tobytes("png")
+    def on_scroll(self, view, *args):
+        """Scrollbar callback: scroll the canvas, rendering newly exposed parts"""
+        view(*args)
+        self.check_viewport()
+    
+    def check_viewport(self, event=None):
+        """Re-render a partially rendered page once its view leaves the rendered area"""
+        if self._shown_clip is None:
+            return
         
-        # Convert to OpenCV format
-        nparr = np.frombuffer(img_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        zoom = self._shown_zoom
+        x0 = self.canvas.xview()[0] * self._shown_rect.width
+        y0 = self.canvas.yview()[0] * self._shown_rect.height
+        visible = fitz.Rect(x0, y0,
+                            x0 + self.canvas.winfo_width() / zoom,
+                            y0 + self.canvas.winfo_height() / zoom) & self._shown_rect
+        if not self._shown_clip.contains(visible):
+            self.schedule_load()
+    
+    def after_done(self, future, callback, *args):
+        """Call callback(result, *args) on the Tk thread once future has finished"""
+        if not future.done():
+            self.root.after(10, self.after_done, future, callback, *args)
+            return
         
-        # Threshold to find black regions
-        _, thresh = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+        try:
+            result = future.result()
+        except Exception as e:
+            self.status_label.config(text=f"Error: {str(e)}")
+            return
+        callback(result, *args)
+    
+    def file_key(self, filepath):
+        """Cheap fingerprint of a PDF for the on-disk box cache"""
+        with open(filepath, "rb") as f:
+            head = f.read(65536)
+        return f"{hashlib.sha1(head).hexdigest()}-{os.path.getsize(filepath)}"
+    
+    def load_boxes(self, page):
+        """Get a page's boxes from the on-disk cache, detecting them on a miss"""
+        if not self._doc_key or page.number in self._modified_pages:
+            return find_boxes_on_page(page)
+        
+        key = f"{self._doc_key}:{page.number}"
+        # A broken cache (truncated db, corrupt or unpicklable entry) only
+        # costs the detection, it mustn't stop the page from loading
+        try:
+            os.makedirs(os.path.dirname(BOX_CACHE_PATH), exist_ok=True)
+            with shelve.open(BOX_CACHE_PATH) as cache:
+                cached = cache.get(key)
+            if cached is not None:
+                return [dict(box, rect=fitz.Rect(box["rect"])) for box in cached]
+        except Exception as e:
+            log.warning("Box cache unavailable: %s", e)
         
-        # Find contours
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = find_boxes_on_page(page)
         
-        # Filter for rectangular regions
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # Filter out very small or very large boxes
-            if w > 20 and h > 10 and w < pix.width * 0.8 and h < pix.height * 0.8:
-                # Convert back to PDF coordinates (accounting for 2x scaling)
-                pdf_x0 = x / 2
-                pdf_y0 = y / 2
-                pdf_x1 = (x + w) / 2
-                pdf_y1 = (y + h) / 2
-                
-                rect = fitz.Rect(pdf_x0, pdf_y0, pdf_x1, pdf_y1)
-                
-                self.all_boxes.append({
-                    "rect": rect,
-                    "width": round(rect.width, 1),
-                    "height": round(rect.height, 1),
-                    "page": self.current_page
-                })
-        
-        print(f"Found {len(self.all_boxes)} boxes using image processing")
-        for i, box in enumerate(self.all_boxes):
-            print(f"  Box {i}: {box['width']}x{box['height']} at ({box['rect'].x0:.1f}, {box['rect'].y0:.1f})")
+        try:
+            with shelve.open(BOX_CACHE_PATH) as cache:
+                cache[key] = [dict(box, rect=tuple(box["rect"])) for box in boxes]
+        except Exception as e:
+            log.warning("Could not cache boxes: %s", e)
+        return boxes
+    
+    def index_boxes(self):
+        """Index the detected boxes for click hit-testing and size matching"""
+        # (width, height) of every box, row i belongs to all_boxes[i]
+        self._box_dims = np.array([(box["width"], box["height"]) for box in self.all_boxes],
+                                  dtype=np.float32).reshape(-1, 2)
+        # (x0, y0, x1, y1) of every box, for scaling them to the canvas
+        self._box_rects = np.array([tuple(box["rect"]) for box in self.all_boxes]).reshape(-1, 4)
+        
+        # Coarse grid of the boxes overlapping each cell
+        self._box_grid = defaultdict(list)
+        for box in self.all_boxes:
+            rect = box["rect"]
+            for gx in range(int(rect.x0 // BOX_GRID_CELL), int(rect.x1 // BOX_GRID_CELL) + 1):
+                for gy in range(int(rect.y0 // BOX_GRID_CELL), int(rect.y1 // BOX_GRID_CELL) + 1):
+                    self._box_grid[(gx, gy)].append(box)
 
 ### CODE BORROWED - CREDIT: Lee Drake https://www.github.com/leedrake5
-    def group_words_into_lines(self, words, line_tol=2.0):
-        """Cluster words into lines using their 'top' coordinate."""
-        if not words:
-            return []
-
-        words = sorted(words, key=lambda w: (float(w.get("top", 0.0)), float(w.get("x0", 0.0))))
-
-        lines = []
-        current = []
-        current_top = None
-
-        for w in words:
-            top = float(w.get("top", 0.0))
-            if current_top is None:
-                current_top = top
-                current = [w]
-                continue
-
-            if abs(top - current_top) <= line_tol:
-                current.append(w)
-                current_top = (current_top * (len(current) - 1) + top) / len(current)
-            else:
-                lines.append(current)
-                current = [w]
-                current_top = top
-
-        if current:
-            lines.append(current)
-
-        return lines
-
-    def build_line_text(self, line_words, space_unit_pts=3.0, min_spaces=1):
-        """Rebuild a line by inserting spaces based on x-gaps."""
-        line_words = sorted(line_words, key=lambda w: float(w.get("x0", 0.0)))
-
-        sizes = []
-        for w in line_words:
-            s = w.get("size", None)
-            if s is not None:
-                try:
-                    sizes.append(float(s))
-                except Exception:
-                    pass
-
-        if sizes:
-            sizes_sorted = sorted(sizes)
-            font_size = float(sizes_sorted[len(sizes_sorted) // 2])
-        else:
-            hs = []
-            for w in line_words:
-                top = float(w.get("top", 0.0))
-                bottom = float(w.get("bottom", top + 10.0))
-                hs.append(max(6.0, bottom - top))
-            hs.sort()
-            font_size = float(hs[len(hs) // 2]) if hs else 10.0
-
-        top_med = sorted([float(w.get("top", 0.0)) for w in line_words])[len(line_words) // 2]
-
-        first_x0 = float(line_words[0].get("x0", 0.0))
-        last_x1 = float(line_words[0].get("x1", line_words[0].get("x0", 0.0)))
-        prev_x1 = float(line_words[0].get("x1", line_words[0].get("x0", 0.0)))
-
-        parts = [line_words[0].get("text", "")]
-
-        for w in line_words[1:]:
-            text = w.get("text", "")
-            x0 = float(w.get("x0", 0.0))
-            x1 = float(w.get("x1", x0))
-
-            gap = x0 - prev_x1
-
-            if gap > 0:
-                n_spaces = int(round(gap / max(0.5, space_unit_pts)))
-                n_spaces = max(min_spaces, n_spaces)
-                parts.append(" " * n_spaces)
-            else:
-                parts.append(" " if gap > -space_unit_pts * 0.3 else "")
-
-            parts.append(text)
-            prev_x1 = max(prev_x1, x1)
-            last_x1 = max(last_x1, x1)
-
-        return "".join(parts), first_x0, last_x1, top_med, font_size
-
-    def extract_lines_with_positions(self, pdf_path, line_tol=2.0, space_unit_pts=3.0, min_spaces=1):
+    def extract_lines_with_positions(self, pdf_path, line_tol=2.0, space_unit_pts=3.0, min_spaces=1,
+                                     page_count=None):
         """Returns list per page: [(line_text, x0, top, font_size), ...]"""
-        pages_lines = []
-
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                words = page.extract_words(
-                    keep_blank_chars=False,
-                    use_text_flow=False,
-                    extra_attrs=["size", "fontname"]
-                )
-
-                lines = self.group_words_into_lines(words, line_tol=line_tol)
-
-                out = []
-                for lw in lines:
-                    line_text, x0, x1, top, font_size = self.build_line_text(
-                        lw, space_unit_pts=space_unit_pts, min_spaces=min_spaces
-                    )
-                    if line_text.strip():
-                        out.append((line_text, x0, top, font_size))
-                pages_lines.append(out)
-
+        # Both exports start from the same extraction, so exporting one after
+        # the other only parses the file once (unless it changed in between)
+        st = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), st.st_size, st.st_mtime_ns, line_tol, space_unit_pts, min_spaces)
+        if key in self._lines_cache:
+            return self._lines_cache[key]
+        
+        # Callers that have the document open already pass its page count
+        if page_count is None:
+            with MUPDF_LOCK, fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+        
+        # pdfplumber is pure Python, so long documents are split into runs of
+        # pages extracted in parallel by worker processes
+        workers = min(REPLACE_WORKERS, page_count // EXPORT_PAGES_PER_WORKER)
+        if workers > 1:
+            step = -(-page_count // workers)
+            chunks = [range(start, min(start + step, page_count))
+                      for start in range(0, page_count, step)]
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                jobs = [executor.submit(extract_page_lines, pdf_path, chunk, line_tol,
+                                        space_unit_pts, min_spaces) for chunk in chunks]
+                pages_lines = [lines for job in jobs for lines in job.result()]
+        else:
+            pages_lines = extract_page_lines(pdf_path, range(page_count), line_tol,
+                                             space_unit_pts, min_spaces)
+        
+        # Only the last extraction is kept, it's the open file's
+        self._lines_cache = {key: pages_lines}
         return pages_lines
 
-    def make_side_by_side(self, input_pdf, output_pdf, line_tol=2.0, space_unit_pts=3.0, min_spaces=1):
+    def make_side_by_side(self, input_pdf, output_pdf, line_tol=2.0, space_unit_pts=3.0, min_spaces=1,
+                          src=None, lines_per_page=None):
         """Create side-by-side PDF: original left, reconstructed text right"""
-        src = fitz.open(input_pdf)
+        # The pages are only read, so an already open copy of input_pdf will do
+        close_src = src is None
+        if close_src:
+            src = fitz.open(input_pdf)
         out = fitz.open()
+        font = fitz.Font("helv")
 
-        lines_per_page = self.extract_lines_with_positions(
-            input_pdf, line_tol=line_tol, space_unit_pts=space_unit_pts, min_spaces=min_spaces
-        )
+        # Callers that already extracted the text pass it in
+        if lines_per_page is None:
+            lines_per_page = self.extract_lines_with_positions(
+                input_pdf, line_tol=line_tol, space_unit_pts=space_unit_pts, min_spaces=min_spaces,
+                page_count=len(src)
+            )
 
         for i, src_page in enumerate(src):
             rect = src_page.rect
@@ -1082,50 +1485,69 @@ HTML files saved to: {output_dir}
             # Left: embed original page
             new_page.show_pdf_page(fitz.Rect(0, 0, w, h), src, i)
 
-            # Right: draw rebuilt text
+            # Right: draw rebuilt text (one text writer per page, written once)
             x_off = w
             page_lines = lines_per_page[i] if i < len(lines_per_page) else []
+            writer = fitz.TextWriter(new_page.rect, color=(0, 0, 0))
 
             for (txt, x0, top, font_size) in page_lines:
                 y = float(top) + float(font_size) * 0.85
 
-                new_page.insert_text(
+                writer.append(
                     fitz.Point(x_off + float(x0), float(y)),
                     txt,
                     fontsize=float(font_size),
-                    fontname="helv",
-                    color=(0, 0, 0),
-                    overlay=True
+                    font=font
                 )
 
-        out.save(output_pdf)
+            writer.write_text(new_page)
+
+        # MuPDF embeds the font once and every page refers to that copy, so
+        # no garbage collection pass is needed to merge copies
+        out.save(output_pdf, deflate=True)
         out.close()
-        src.close()
+        if close_src:
+            src.close()
 
-    def make_overlay_white(self, input_pdf, output_pdf, line_tol=2.0, space_unit_pts=3.0, min_spaces=1):
+    def make_overlay_white(self, input_pdf, output_pdf, line_tol=2.0, space_unit_pts=3.0, min_spaces=1,
+                           lines_per_page=None):
         """Overlay extracted text in white on original PDF"""
         doc = fitz.open(input_pdf)
 
-        lines_per_page = self.extract_lines_with_positions(
-            input_pdf, line_tol=line_tol, space_unit_pts=space_unit_pts, min_spaces=min_spaces
-        )
+        # Callers that already extracted the text pass it in
+        if lines_per_page is None:
+            lines_per_page = self.extract_lines_with_positions(
+                input_pdf, line_tol=line_tol, space_unit_pts=space_unit_pts, min_spaces=min_spaces,
+                page_count=len(doc)
+            )
 
+        font = fitz.Font("helv")
         for i, page in enumerate(doc):
             page_lines = lines_per_page[i] if i < len(lines_per_page) else []
+            writer = fitz.TextWriter(page.rect, color=(1, 1, 1))   # white
             for (txt, x0, top, font_size) in page_lines:
                 y = float(top) + float(font_size) * 0.85
-                page.insert_text(
+                writer.append(
                     fitz.Point(float(x0), float(y)),
                     txt,
                     fontsize=float(font_size),
-                    fontname="helv",
-                    color=(1, 1, 1),   # white
-                    overlay=True
+                    font=font
                 )
+            writer.write_text(page)
 
-        doc.save(output_pdf)
+        # The font is embedded once for all pages, so the user's document
+        # isn't put through a garbage collection rewrite
+        doc.save(output_pdf, deflate=True)
         doc.close()
 
+    def export_lines(self, pdf_path):
+        """Extract the text of the open document's file for an export"""
+        with MUPDF_LOCK:
+            page_count = len(self.pdf_doc)
+        # pdfplumber and the worker processes read the file themselves, so
+        # the render thread can keep using MuPDF while they do
+        return self.extract_lines_with_positions(pdf_path, page_count=page_count)
+
     def export_side_by_side(self):
         """Add this as a button callback - exports side-by-side comparison"""
         if not self.pdf_doc:
@@ -1143,7 +1565,13 @@ HTML files saved to: {output_dir}
         
         try:
             current_path = self.pdf_doc.name
-            self.make_side_by_side(current_path, output_path)
+            lines_per_page = self.export_lines(current_path)
+            with MUPDF_LOCK:
+                # Reuse the open document unless it has changes the file
+                # (which the text is extracted from) doesn't
+                src = None if self._modified_pages else self.pdf_doc
+                self.make_side_by_side(current_path, output_path, src=src,
+                                       lines_per_page=lines_per_page)
             messagebox.showinfo("Success", f"Side-by-side PDF saved!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed: {str(e)}")
@@ -1165,19 +1593,31 @@ HTML files saved to: {output_dir}
         
         try:
             current_path = self.pdf_doc.name
-            self.make_overlay_white(current_path, output_path)
+            lines_per_page = self.export_lines(current_path)
+            with MUPDF_LOCK:
+                self.make_overlay_white(current_path, output_path, lines_per_page=lines_per_page)
             messagebox.showinfo("Success", f"White overlay PDF saved!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed: {str(e)}")
 ### END BORROWED CODE
                     
+    def sync_boxes(self):
+        """Bring the box outlines on the canvas in line with all_boxes and the shown zoom"""
+        if self._drawn_boxes is not self.all_boxes:
+            self.canvas.delete("box")
+            self.draw_boxes()
+            self._drawn_boxes = self.all_boxes
+        elif self._shown_zoom != self._boxes_zoom:
+            # Same boxes at another zoom, just move the existing items
+            ratio = self._shown_zoom / self._boxes_zoom
+            self.canvas.scale("box", 0, 0, ratio, ratio)
+        self._boxes_zoom = self._shown_zoom
+    
     def draw_boxes(self):
         """Draw rectangles on canvas to show detected boxes"""
-        for i, box in enumerate(self.all_boxes):
-            rect = box["rect"]
-            x0, y0 = rect.x0 * self.zoom, rect.y0 * self.zoom
-            x1, y1 = rect.x1 * self.zoom, rect.y1 * self.zoom
-            
+        # Scale all the boxes to canvas coordinates at once
+        coords = (self._box_rects * self._shown_zoom).tolist()
+        for i, (box, (x0, y0, x1, y1)) in enumerate(zip(self.all_boxes, coords)):
             # Highlight selected box
             if self.selected_box and \
                box["width"] == self.selected_box["width"] and \
@@ -1188,9 +1628,15 @@ HTML files saved to: {output_dir}
                 color = "blue"
                 width = 2
             
-            tag = f"box_{i}"
+            # Boxes of the same size share a tag so selection can restyle
+            # them without redrawing everything
+            tags = ("box", f"box_{i}", self.size_tag(box))
             self.canvas.create_rectangle(x0, y0, x1, y1, 
-                                        outline=color, width=width, tags=tag)
+                                        outline=color, width=width, tags=tags)
+    
+    def size_tag(self, box):
+        """Canvas tag shared by all boxes of the same size"""
+        return f"size_{box['width']}x{box['height']}"
     
     def on_canvas_click(self, event):
         """Handle click on canvas to select a box"""
@@ -1201,42 +1647,40 @@ HTML files saved to: {output_dir}
         # Convert canvas coordinates to PDF coordinates
         canvas_x = self.canvas.canvasx(event.x)
         canvas_y = self.canvas.canvasy(event.y)
-        pdf_x = canvas_x / self.zoom
-        pdf_y = canvas_y / self.zoom
+        pdf_x = canvas_x / self._shown_zoom
+        pdf_y = canvas_y / self._shown_zoom
         
-        print(f"Click at canvas: ({event.x}, {event.y})")
-        print(f"Scrolled canvas: ({canvas_x}, {canvas_y})")
-        print(f"PDF coords: ({pdf_x:.1f}, {pdf_y:.1f})")
-        print(f"Checking {len(self.all_boxes)} boxes:")
-        
-        # Find clicked box
-        for i, box in enumerate(self.all_boxes):
+        # Find clicked box, only looking at the boxes in the clicked grid cell
+        cell = (int(pdf_x // BOX_GRID_CELL), int(pdf_y // BOX_GRID_CELL))
+        for box in self._box_grid.get(cell, ()):
             rect = box["rect"]
-            print(f"  Box {i}: ({rect.x0:.1f}, {rect.y0:.1f}) to ({rect.x1:.1f}, {rect.y1:.1f})")
             
             # Check if click is inside this box
             if rect.x0 <= pdf_x <= rect.x1 and rect.y0 <= pdf_y <= rect.y1:
+                # Restyle just the previously and newly selected boxes
+                if self.selected_box:
+                    self.canvas.itemconfig(self.size_tag(self.selected_box),
+                                           outline="blue", width=2)
+                self.canvas.itemconfig(self.size_tag(box), outline="red", width=3)
+                
                 self.selected_box = box
-                print(f"  -> SELECTED!")
                 self.status_label.config(
                     text=f"Selected box: {box['width']}x{box['height']} pts. "
                          f"Click 'Replace Boxes' to replace all boxes of this size."
                 )
-                self.draw_boxes()  # Redraw to highlight selection
                 return
         
-        print("  -> No box found at click location")
         self.status_label.config(text="No box found at click location")
     
     def prev_page(self):
         if self.pdf_doc and self.current_page > 0:
             self.current_page -= 1
-            self.load_page()
+            self.schedule_load()
     
     def next_page(self):
         if self.pdf_doc and self.current_page < len(self.pdf_doc) - 1:
             self.current_page += 1
-            self.load_page()
+            self.schedule_load()
     
     def replace_boxes(self):
         """Replace all boxes matching the selected box dimensions"""
@@ -1255,9 +1699,10 @@ HTML files saved to: {output_dir}
             return
         
         # Apply replacements to the current page in memory
-        self.apply_replacements(self.selected_box["width"], 
-                               self.selected_box["height"], 
-                               text)
+        with MUPDF_LOCK:
+            self.apply_replacements(self.selected_box["width"], 
+                                   self.selected_box["height"], 
+                                   text)
         
         # Reload the page to show changes
         self.load_page()
@@ -1265,86 +1710,552 @@ HTML files saved to: {output_dir}
         self.status_label.config(text=f"Replaced boxes on page {self.current_page + 1}. "
                                      "Navigate pages to apply to others. Use File > Save to save changes.")
 
-    def apply_replacements(self, target_width, target_height, text, tolerance=2.0):
-        """Apply replacements to current page by modifying the page image"""
-        page = self.pdf_doc[self.current_page]
+    def replace_all_pages(self):
+        """Replace all boxes matching the selected box dimensions on every page"""
+        if not self.pdf_doc:
+            messagebox.showwarning("Warning", "No PDF loaded")
+            return
         
-        # Get the actual page dimensions
-        page_rect = page.rect
-        page_width = page_rect.width
-        page_height = page_rect.height
+        if not self.selected_box:
+            messagebox.showwarning("Warning", "No box selected. Click on a box first.")
+            return
         
-        # Render page to image at ACTUAL SIZE (1x, not 2x)
-        mat = fitz.Matrix(1, 1)
-        pix = page.get_pixmap(matrix=mat)
+        text = simpledialog.askstring("Replacement Text", 
+                                     "Enter text to place in white boxes on every page:")
+        if not text:
+            return
         
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
-        img = Image.open(io.BytesIO(img_data))
-        draw = ImageDraw.Draw(img)
+        # Pages nobody has looked at yet need their boxes found first
+        with MUPDF_LOCK:
+            pages = [p for p in range(len(self.pdf_doc)) if p not in self._boxes_cache]
+        
+        # A few pages are quicker to do right here than to start a pool and
+        # send every worker a copy of the document
+        workers = min(REPLACE_WORKERS, len(pages) // REPLACE_PAGES_PER_WORKER)
+        if workers <= 1:
+            with MUPDF_LOCK:
+                for page_num in pages:
+                    try:
+                        self._boxes_cache[page_num] = self.load_boxes(self.pdf_doc[page_num])
+                    except Exception as e:
+                        log.error("Error finding boxes: %s", e)
+            self.finish_replace_all([], self.selected_box["width"], self.selected_box["height"], text)
+            return
         
-        count = 0
-        # Find matching boxes and draw white rectangles with text
-        for box in self.all_boxes:
-            width = box["width"]
-            height = box["height"]
+        # Otherwise spread them over worker processes, each opening its own
+        # copy of the document as it is now (including earlier replacements)
+        with MUPDF_LOCK:
+            pdf_bytes = self.pdf_doc.tobytes()
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=init_box_worker, initargs=(pdf_bytes,))
+        jobs = [executor.submit(detect_page_boxes, page_num) for page_num in pages]
+        executor.shutdown(wait=False)
+        
+        # Modal, so the document can't change under the workers
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Finding boxes")
+        progress_var = tk.IntVar(value=0)
+        ttk.Progressbar(progress_window, maximum=len(jobs),
+                        variable=progress_var).pack(fill="x", padx=10, pady=10)
+        ttk.Label(progress_window, text=f"Scanning {len(jobs)} pages…").pack(pady=5)
+        progress_window.grab_set()
+        
+        selected = self.selected_box
+        
+        def poll():
+            done = sum(job.done() for job in jobs)
+            progress_var.set(done)
+            if done < len(jobs):
+                self.root.after(50, poll)
+                return
             
-            # Check if dimensions match (within tolerance)
-            if abs(width - target_width) <= tolerance and \
-               abs(height - target_height) <= tolerance:
-                
-                rect = box["rect"]
-                x0 = rect.x0
-                y0 = rect.y0
-                x1 = rect.x1
-                y1 = rect.y1
-                
-                # Draw white rectangle
-                draw.rectangle([x0, y0, x1, y1], fill='white', outline='black', width=1)
-                
-                # Add text
-                font_size = int(min(height * 0.6, 12))
+            progress_window.destroy()
+            self.finish_replace_all(jobs, selected["width"], selected["height"], text)
+        
+        poll()
+    
+    def finish_replace_all(self, jobs, target_width, target_height, text):
+        """Store the boxes found by the workers and replace them on every page"""
+        for job in jobs:
+            try:
+                page_num, boxes = job.result()
+            except Exception as e:
+                log.error("Error finding boxes: %s", e)
+                continue
+            self._boxes_cache.setdefault(page_num, boxes)
+        
+        replaced = 0
+        changed_pages = 0
+        with MUPDF_LOCK:
+            for page_num in range(len(self.pdf_doc)):
+                boxes = self._boxes_cache.get(page_num)
+                if not boxes:
+                    continue
+                count = self.apply_replacements(target_width, target_height, text,
+                                                page_num=page_num, boxes=boxes)
+                if count:
+                    replaced += count
+                    changed_pages += 1
+        
+        self.load_page()
+        self.status_label.config(text=f"Replaced {replaced} boxes on {changed_pages} pages. "
+                                     "Use File > Save to save changes.")
+
+    def apply_replacements(self, target_width, target_height, text, tolerance=2.0,
+                           page_num=None, boxes=None):
+        """Apply replacements to a page (the current one by default) by drawing over the boxes"""
+        if page_num is None:
+            page_num = self.current_page
+        page = self.pdf_doc[page_num]
+        
+        # The current page's box sizes are already gathered by index_boxes
+        if boxes is None:
+            boxes, dims = self.all_boxes, self._box_dims
+        else:
+            dims = np.array([(box["width"], box["height"]) for box in boxes],
+                            dtype=np.float32).reshape(-1, 2)
+        
+        # Find boxes whose dimensions match (within tolerance) in one pass
+        matches = np.flatnonzero(
+            (np.abs(dims - (target_width, target_height)) <= tolerance).all(axis=1)
+        )
+        
+        if len(matches) == 0:
+            return 0
+        
+        rects = [boxes[i]["rect"] for i in matches]
+        
+        # Actually remove whatever is under the boxes (the black fill and any
+        # hidden text), leaving them white. Images are left alone, scanned
+        # pages keep their pixels. Text goes first, within the exact boxes so
+        # words right next to them survive; line art is kept on that pass,
+        # since by default any path merely touching a box (table rules,
+        # underlines, a path holding other boxes too) would be deleted
+        for rect in rects:
+            page.add_redact_annot(rect, fill=(1, 1, 1))
+        page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE,
+                              graphics=fitz.PDF_REDACT_LINE_ART_NONE)
+
+        # Then the boxes themselves: only paths lying entirely inside a box
+        # are removed. The margin takes in a box's outline, which sticks out
+        # by half its stroke width
+        for rect in rects:
+            page.add_redact_annot(rect + (-1, -1, 1, 1))
+        page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE,
+                              graphics=fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED,
+                              text=fitz.PDF_REDACT_TEXT_NONE)
+        
+        # Text width scales linearly with font size, so measure it just once
+        unit_width = fitz.get_text_length(text, fontname="helv", fontsize=1)
+        
+        # Draw the outlines and text for all boxes on one Shape so the page's
+        # content stream only gets rewritten once more. The page stays
+        # vector, so the rest of its text remains searchable
+        shape = page.new_shape()
+        for rect in rects:
+            shape.draw_rect(rect)
+            shape.finish(color=(0, 0, 0), fill=(1, 1, 1), width=1)
+            
+            # Center the text
+            font_size = int(min(rect.height * 0.6, 12))
+            text_width = unit_width * font_size
+            text_x = rect.x0 + (rect.width - text_width) / 2
+            text_y = rect.y0 + (rect.height + font_size * 0.7) / 2  # Baseline
+            shape.insert_text((text_x, text_y), text, fontname="helv",
+                              fontsize=font_size, color=(0, 0, 0))
+        shape.commit(overlay=True)
+        
+        self.invalidate_page(page_num)
+        
+        return len(rects)
+
+    def invalidate_page(self, page_num):
+        """Drop cached renders and boxes of a page after it has been modified"""
+        self._boxes_cache.pop(page_num, None)
+        self._modified_pages.add(page_num)
+        for key in [k for k in self._page_cache if k[0] == page_num]:
+            del self._page_cache[key]
+
+def is_transient(error, path):
+    """Whether opening path failed with a read error worth retrying (see OPEN_RETRY_ERRNOS)"""
+    if isinstance(error, fitz.FileDataError):
+        # MuPDF doesn't say why it couldn't open the file, so read it
+        # directly; if that works, the file itself is broken
+        try:
+            with open(path, "rb") as f:
+                f.read(1)
+            return False
+        except OSError as e:
+            error = e
+    return getattr(error, "errno", None) in OPEN_RETRY_ERRNOS
+
+def open_pdf_with_retry(pdf_path):
+    """Open a PDF, retrying with backoff if reading it fails (see OPEN_RETRIES)"""
+    for attempt in range(OPEN_RETRIES):
+        try:
+            return fitz.open(pdf_path)
+        except (OSError, fitz.FileDataError) as e:
+            if attempt == OPEN_RETRIES - 1 or not is_transient(e, pdf_path):
+                raise
+            time.sleep(min(OPEN_RETRY_DELAY * 2 ** attempt, OPEN_RETRY_MAX_DELAY))
+
+# Auto unredact turns PDFs into pages in worker processes, so this lives
+# outside the class where it can be pickled
+def extract_text_from_pdf(pdf_path):
+    """Extract all text from a PDF file"""
+    text_by_page = {}
+    ocr_mode = False
+    
+    try:
+        # The document is closed as soon as we're done with it, even if
+        # extraction fails halfway
+        with open_pdf_with_retry(pdf_path) as pdf_doc:
+            # Don't open any pages of a locked or empty file, it just counts
+            # as failed
+            if pdf_doc.needs_pass and not pdf_doc.authenticate(""):
+                log.warning("Skipping encrypted PDF %s", pdf_path)
+                return text_by_page, ocr_mode
+            if pdf_doc.page_count == 0:
+                log.warning("Skipping empty PDF %s", pdf_path)
+                return text_by_page, ocr_mode
+            
+            for page_num in range(pdf_doc.page_count):
+                # Skip a broken page rather than losing the whole file
                 try:
-                    from PIL import ImageFont
-                    font = ImageFont.truetype("arial.ttf", font_size)
-                except:
-                    font = ImageFont.load_default()
+                    page = pdf_doc[page_num]
+                    
+                    # Extract text
+                    text = page.get_text("text", flags=TEXT_FLAGS).strip()
+                except fitz.FileDataError as e:
+                    log.warning("Skipping page %d of %s: %s", page_num + 1, pdf_path, e)
+                    continue
                 
-                # Center the text
-                bbox = draw.textbbox((0, 0), text, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                text_x = x0 + (x1 - x0 - text_width) / 2
-                text_y = y0 + (y1 - y0 - text_height) / 2
+                # Only a page without text needs checking for images; if it
+                # has any, it's OCR mode
+                if text:
+                    text_by_page[page_num + 1] = text
+                elif page.get_images():
+                    ocr_mode = True
                 
-                draw.text((text_x, text_y), text, fill='black', font=font)
-                count += 1
-        
-        if count > 0:
-            # Save modified image
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
-            
-            # Create a new blank page with exact dimensions
-            temp_pdf = fitz.open()
-            new_page = temp_pdf.new_page(width=page_width, height=page_height)
-            
-            # Insert the image to fill the entire page
-            new_page.insert_image(page_rect, stream=img_bytes.read())
-            
-            # Replace the page in the main document
-            self.pdf_doc.delete_page(self.current_page)
-            self.pdf_doc.insert_pdf(temp_pdf, from_page=0, to_page=0, start_at=self.current_page)
-            
-            temp_pdf.close()
+                # Free the page's MuPDF structures now instead of when the
+                # next page replaces it
+                del page
         
-        return count
+    except Exception as e:
+        log.error("Error extracting text from %s: %s", pdf_path, e)
+    
+    finally:
+        # Have MuPDF drop what it cached for the document so batches of
+        # scans don't pile up in memory
+        fitz.TOOLS.store_shrink(100)
+    
+    return text_by_page, ocr_mode
+
+def write_pdf_html(pdf_path, output_dir, prev_file, next_file):
+    """Turn one PDF into an HTML page, returns its path (None without text)"""
+    text_by_page, ocr_mode = extract_text_from_pdf(pdf_path)
+    if not text_by_page:
+        return None
+    
+    return create_html_from_text(
+        pdf_path,
+        text_by_page,
+        ocr_mode,
+        output_dir,
+        prev_file=prev_file,  # Pass the actual previous file
+        next_file=next_file   # Pass the actual next file
+    )
+
+def create_html_from_text(pdf_path, text_by_page, ocr_mode, output_dir, prev_file=None, next_file=None):
+    """Create an HTML file from extracted text with Next/Previous navigation"""
+    pdf_name = os.path.basename(pdf_path)
+    html_name = os.path.splitext(pdf_name)[0] + ".html"
+    html_path = os.path.join(output_dir, html_name)
+    
+    log.debug("%s: previous %s, next %s", html_name, prev_file, next_file)
+    
+    nav_html, adjacent = navigation_html(prev_file, next_file)
+    
+    # Write the HTML file as it is generated instead of building it all
+    # in memory first, with the same navigation at the top and bottom
+    with open(html_path, 'w', encoding='utf-8', buffering=HTML_WRITE_BUFFER) as f:
+        f.write(PAGE_HEAD_TEMPLATE.format(
+            pdf_name=html.escape(pdf_name),
+            pdf_path=html.escape(pdf_path),
+            generated=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            page_count=len(text_by_page),
+            method="OCR (Image-based extraction)" if ocr_mode else "Text layer extraction",
+            nav=nav_html,
+            adjacent=adjacent,
+            warning=OCR_WARNING_HTML if ocr_mode is False else ""
+        ))
+    
+        # Add each page
+        for page_num, text in sorted(text_by_page.items()):
+            f.write(PAGE_SECTION_TEMPLATE.format(num=page_num, text=html.escape(text)))
+    
+        f.write(PAGE_FOOT_TEMPLATE.format(nav=nav_html))
+    
+    return html_path
+
+def navigation_html(prev_file, next_file):
+    """Navigation buttons and adjacent files text for a page"""
+    # Escape the neighbour names once, they go in more than one place
+    esc_prev = html.escape(prev_file) if prev_file else ""
+    esc_next = html.escape(next_file) if next_file else ""
+    
+    nav_html = NAV_TEMPLATE.format(
+        prev=NAV_PREV_LINK.format(href=esc_prev) if prev_file else NAV_PREV_NONE,
+        next=NAV_NEXT_LINK.format(href=esc_next) if next_file else NAV_NEXT_NONE
+    )
+    
+    adjacent = ""
+    if prev_file:
+        adjacent += f"Previous: <code>{esc_prev}</code><br>"
+    if next_file:
+        adjacent += f"Next: <code>{esc_next}</code>"
+    
+    return nav_html, adjacent
+
+# The viewer finds the boxes of the page shown, worker processes those of
+# every page for Replace on All Pages
+def find_boxes_on_page(page):
+    """Find all black rectangles on the page"""
+    # Born-digital PDFs draw their redaction boxes as filled vector
+    # rectangles, so read those directly; scans need image processing
+    boxes = find_vector_boxes(page)
+    method = "vector drawings"
+    if not boxes:
+        boxes = find_image_boxes(page)
+        method = "image processing"
+    
+    # This runs for every page shown, so only go through the boxes when
+    # someone is actually looking at debug output
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Found %d boxes using %s", len(boxes), method)
+        for i, box in enumerate(boxes):
+            log.debug("  Box %d: %sx%s at (%.1f, %.1f)", i, box["width"], box["height"],
+                      box["rect"].x0, box["rect"].y0)
+    
+    return boxes
+
+def find_vector_boxes(page):
+    """Find filled dark rectangles among the page's vector drawings"""
+    boxes = []
+    page_rect = page.rect
+    
+    for drawing in page.get_drawings():
+        fill = drawing.get("fill")
+        if not fill:
+            continue
+        if len(fill) == 4:  # CMYK
+            c, m, y, k = fill
+            fill = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+        if max(fill) >= 0.3:
+            continue
+    
+        for item in drawing["items"]:
+            if item[0] == "re":
+                rect = fitz.Rect(item[1])
+            elif item[0] == "qu":
+                rect = item[1].rect
+            else:
+                continue
+    
+            # Same size limits as the image search (10x5 pts minimum)
+            if rect.width > 10 and rect.height > 5 and \
+               rect.width < page_rect.width * 0.8 and rect.height < page_rect.height * 0.8:
+                boxes.append({
+                    "rect": rect,
+                    "width": round(rect.width, 1),
+                    "height": round(rect.height, 1),
+                    "page": page.number
+                })
+    
+    return boxes
+
+def find_image_boxes(page):
+    """Find all black rectangles on the page using image processing"""
+    import cv2  # Slow to import and only needed for scanned pages
+    
+    boxes = []
+    
+    # Render page to image; normal pages have plenty of pixels per box
+    # at 1x, only small pages need the extra resolution
+    scale = DETECT_SCALE_SMALL if page.rect.width < DETECT_SMALL_PAGE_WIDTH else DETECT_SCALE
+    mat = fitz.Matrix(scale, scale)
+    # Have MuPDF render grayscale directly, a third of the bytes of RGB
+    # and no color conversion afterwards
+    pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+    pix_width, pix_height = pix.width, pix.height
+    
+    # View the raw samples as an OpenCV image instead of going through
+    # PNG, without even copying them out of the pixmap
+    gray = np.frombuffer(pix.samples_mv, np.uint8).reshape(pix.height, pix.width)
+    
+    # Threshold to find black regions. gray points into the pixmap, so
+    # only let go of that once the thresholded copy exists
+    _, thresh = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+    gray = pix = None
+    
+    # Label the dark regions; the stats give each one's bounding box and
+    # pixel count without tracing any contours
+    _, _, stats, _ = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+    
+    # Filter for rectangular regions (label 0 is the background) over all
+    # regions at once, a scan can have thousands of them (one per glyph)
+    stats = stats[1:]
+    _, _, widths, heights, areas = stats.T
+    keep = (
+        # Redaction boxes are solid, so they fill almost all of their
+        # bounding box; text and other shapes don't
+        (areas >= widths * heights * 0.85) &
+        # Filter out very small (under 10x5pt) or very large boxes
+        (widths > 10 * scale) & (heights > 5 * scale) &
+        (widths < pix_width * 0.8) & (heights < pix_height * 0.8)
+    )
+    
+    # Convert back to PDF coordinates (accounting for the scaling), again
+    # for all boxes in one go
+    corners = stats[keep, :4].astype(np.float64)
+    corners[:, 2:] += corners[:, :2]
+    corners /= scale
+    
+    for pdf_x0, pdf_y0, pdf_x1, pdf_y1 in corners.tolist():
+        rect = fitz.Rect(pdf_x0, pdf_y0, pdf_x1, pdf_y1)
+    
+        boxes.append({
+            "rect": rect,
+            "width": round(rect.width, 1),
+            "height": round(rect.height, 1),
+            "page": page.number
+        })
+    
+    return boxes
+
+# Box detection for Replace on All Pages runs in worker processes, with the
+# document being edited opened once per worker
+BOX_WORKER_DOC = None
+
+def init_box_worker(pdf_bytes):
+    """Open the document in a box detection worker"""
+    global BOX_WORKER_DOC
+    BOX_WORKER_DOC = fitz.open("pdf", pdf_bytes)
+
+def detect_page_boxes(page_num):
+    """Find the boxes on one page of the worker's document"""
+    return page_num, find_boxes_on_page(BOX_WORKER_DOC[page_num])
+
+# The exports extract text with pdfplumber, long documents in worker
+# processes, so this lives outside the class where it can be pickled
+### CODE BORROWED - CREDIT: Lee Drake https://www.github.com/leedrake5
+def group_words_into_lines(words, line_tol=2.0):
+    """Cluster words into lines using their 'top' coordinate."""
+    if not words:
+        return []
+    
+    # Sort by (top, x0) and cut wherever the next word sits more than
+    # line_tol below the previous one, all in numpy rather than a Python
+    # loop per word (pages can have thousands of words)
+    tops = np.fromiter((float(w.get("top", 0.0)) for w in words), dtype=np.float64, count=len(words))
+    x0s = np.fromiter((float(w.get("x0", 0.0)) for w in words), dtype=np.float64, count=len(words))
+    order = np.lexsort((x0s, tops))
+    cuts = np.flatnonzero(np.diff(tops[order]) > line_tol) + 1
+    
+    return [[words[i] for i in group] for group in np.split(order, cuts)]
+
+def build_line_text(line_words, space_unit_pts=3.0, min_spaces=1):
+    """Rebuild a line by inserting spaces based on x-gaps."""
+    line_words = sorted(line_words, key=lambda w: float(w.get("x0", 0.0)))
+    
+    sizes = []
+    for w in line_words:
+        s = w.get("size", None)
+        if s is not None:
+            try:
+                sizes.append(float(s))
+            except Exception:
+                pass
+    
+    if sizes:
+        sizes_sorted = sorted(sizes)
+        font_size = float(sizes_sorted[len(sizes_sorted) // 2])
+    else:
+        hs = []
+        for w in line_words:
+            top = float(w.get("top", 0.0))
+            bottom = float(w.get("bottom", top + 10.0))
+            hs.append(max(6.0, bottom - top))
+        hs.sort()
+        font_size = float(hs[len(hs) // 2]) if hs else 10.0
+    
+    top_med = sorted([float(w.get("top", 0.0)) for w in line_words])[len(line_words) // 2]
+    
+    first_x0 = float(line_words[0].get("x0", 0.0))
+    last_x1 = float(line_words[0].get("x1", line_words[0].get("x0", 0.0)))
+    prev_x1 = float(line_words[0].get("x1", line_words[0].get("x0", 0.0)))
+    
+    parts = [line_words[0].get("text", "")]
+    
+    for w in line_words[1:]:
+        text = w.get("text", "")
+        x0 = float(w.get("x0", 0.0))
+        x1 = float(w.get("x1", x0))
+    
+        gap = x0 - prev_x1
+    
+        if gap > 0:
+            n_spaces = int(round(gap / max(0.5, space_unit_pts)))
+            n_spaces = max(min_spaces, n_spaces)
+            parts.append(" " * n_spaces)
+        else:
+            parts.append(" " if gap > -space_unit_pts * 0.3 else "")
+    
+        parts.append(text)
+        prev_x1 = max(prev_x1, x1)
+        last_x1 = max(last_x1, x1)
+    
+    return "".join(parts), first_x0, last_x1, top_med, font_size
+
+def extract_page_lines(pdf_path, page_numbers, line_tol, space_unit_pts, min_spaces):
+    """Extract the text lines of some of a PDF's pages (0-based numbers)"""
+    import pdfplumber  # Slow to import and only needed for the exports
+    
+    pages_lines = []
+    
+    with pdfplumber.open(pdf_path, pages=[n + 1 for n in page_numbers]) as pdf:
+        for page in pdf.pages:
+            words = page.extract_words(
+                keep_blank_chars=False,
+                use_text_flow=False,
+                extra_attrs=["size", "fontname"]
+            )
+    
+            lines = group_words_into_lines(words, line_tol=line_tol)
+    
+            out = []
+            for lw in lines:
+                line_text, x0, x1, top, font_size = build_line_text(
+                    lw, space_unit_pts=space_unit_pts, min_spaces=min_spaces
+                )
+                if line_text.strip():
+                    out.append((line_text, x0, top, font_size))
+            pages_lines.append(out)
+    
+            # pdf.pages holds on to every page, drop this one's parsed
+            # objects so memory doesn't grow with the page count
+            page.close()
+    
+    return pages_lines
+### END BORROWED CODE
 
 def main():
+    logging.basicConfig(level=logging.WARNING)
     root = tk.Tk()
     app = PDFBoxReplacer(root)
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # For the worker processes in frozen Windows builds
     main()